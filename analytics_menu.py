@@ -1,10 +1,30 @@
 from telegram import ReplyKeyboardMarkup
 from telegram.ext import ConversationHandler, MessageHandler, filters
-from bot import CHOOSING, get_main_keyboard, get_sheet
+import asyncio
+import logging
+import os
+import daily_stats
+import reports
+from bot import CHOOSING, get_main_keyboard, gateway, replica
+from sheets import sheet_title
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
 # --- Стани ---
 ANALYTICS_MENU, ANALYTICS_DATE_INPUT, STATISTICS_MENU, STATISTICS_PERIOD_START, STATISTICS_PERIOD_END, STATISTICS_STANDARD = range(100, 106)
+REPORT_PERIOD_START, REPORT_PERIOD_END, REPORT_FORMAT = range(106, 109)
+
+ANALYTICS_STATE_NAMES = {
+    ANALYTICS_MENU: "analytics_menu",
+    ANALYTICS_DATE_INPUT: "analytics_date_input",
+    STATISTICS_MENU: "statistics_menu",
+    STATISTICS_PERIOD_START: "statistics_period_start",
+    STATISTICS_PERIOD_END: "statistics_period_end",
+    REPORT_PERIOD_START: "report_period_start",
+    REPORT_PERIOD_END: "report_period_end",
+    REPORT_FORMAT: "report_format",
+}
 
 analytics_keyboard = ReplyKeyboardMarkup([
     ["🔍 Перевірити за датою"],
@@ -15,9 +35,27 @@ analytics_keyboard = ReplyKeyboardMarkup([
 statistics_keyboard = ReplyKeyboardMarkup([
     ["📅 За період", "📆 Сьогодні/вчора"],
     ["📈 Загальна статистика"],
+    ["📤 Звіт"],
+    ["⬅️ Назад"]
+], resize_keyboard=True)
+
+report_period_keyboard = ReplyKeyboardMarkup([
+    ["♾ За весь час"],
     ["⬅️ Назад"]
 ], resize_keyboard=True)
 
+report_format_keyboard = ReplyKeyboardMarkup([
+    ["📄 CSV", "📗 XLSX"],
+    ["⬅️ Назад"]
+], resize_keyboard=True)
+
+REPORT_FORMATS = {"📄 CSV": "csv", "📗 XLSX": "xlsx"}
+
+# --- Статистика з денних агрегатів локальної репліки ---
+async def _stats(context, query, *args):
+    await replica.ensure_ready(gateway)
+    return await asyncio.to_thread(query, replica, sheet_title(context.user_data.get("mode")), *args)
+
 # === Обробник кнопки "📊 Аналітика" ===
 async def show_analytics_menu(update, context):
     await update.message.reply_text("📊 *Меню аналітики*", reply_markup=analytics_keyboard, parse_mode="Markdown")
@@ -34,20 +72,20 @@ async def show_employees_by_date(update, context):
         return await analytics_back(update, context)
     try:
         dt = datetime.strptime(date_str, "%d.%m.%y")
-        formatted_date = dt.strftime("%d.%m.%y")
     except ValueError:
         await update.message.reply_text("❌ Невірний формат дати.")
         return ANALYTICS_DATE_INPUT
 
     try:
-        sheet = get_sheet(context)
-        records = sheet.get_all_records()
-        results = [f"👤 {row.get('ПІБ')} – *{row.get('Статус')}*" for row in records if row.get("Дата") == formatted_date]
+        await replica.ensure_ready(gateway)
+        rows = await asyncio.to_thread(replica.by_date, sheet_title(context.user_data.get("mode")), dt.date())
+        results = [f"👤 {pib} – *{status}*" for pib, status in rows]
         if results:
             await update.message.reply_text("\n".join(results), parse_mode="Markdown")
         else:
             await update.message.reply_text("ℹ️ Працівників за цю дату не знайдено.")
-    except Exception as e:
+    except Exception:
+        logger.exception("Аналітика за датою")
         await update.message.reply_text("⚠️ Помилка при зчитуванні таблиці.")
     return await analytics_back(update, context)
 
@@ -63,7 +101,7 @@ async def ask_period_start(update, context):
 async def ask_period_end(update, context):
     try:
         context.user_data["stat_start"] = datetime.strptime(update.message.text.strip(), "%d.%m.%y")
-    except:
+    except ValueError:
         await update.message.reply_text("❌ Невірний формат.")
         return STATISTICS_PERIOD_START
     await update.message.reply_text("📆 Тепер введіть кінцеву дату:")
@@ -76,26 +114,8 @@ async def show_statistics_period(update, context):
         if not start_date:
             raise ValueError("Немає початкової дати")
 
-        sheet = get_sheet(context)
-        records = sheet.get_all_records()
-        submitted = checked = positive = negative = 0
-
-        for row in records:
-            row_date_str = row.get("Дата")
-            try:
-                row_date = datetime.strptime(row_date_str, "%d.%m.%y")
-            except:
-                continue
-
-            if start_date <= row_date <= end_date:
-                submitted += 1
-                status = row.get("Статус", "").lower()
-                if status != "очікує погодження":
-                    checked += 1
-                    if "погоджено" in status:
-                        positive += 1
-                    elif "не погоджено" in status:
-                        negative += 1
+        stats = await _stats(context, daily_stats.period_stats, start_date.date(), end_date.date())
+        submitted, checked, positive, negative = stats.submitted, stats.checked, stats.approved, stats.rejected
 
         text = (
             f"📊 *Статистика з {start_date.strftime('%d.%m.%y')} по {end_date.strftime('%d.%m.%y')}*\n\n"
@@ -105,9 +125,13 @@ async def show_statistics_period(update, context):
             f"❌ Негативних: *{negative}*"
         )
         await update.message.reply_text(text, parse_mode="Markdown")
-    except:
+    except ValueError:
         await update.message.reply_text("⚠️ Помилка. Перевірте формат дат.")
         return STATISTICS_MENU
+    except Exception:
+        logger.exception("Статистика за період")
+        await update.message.reply_text("⚠️ Помилка при зчитуванні.")
+        return STATISTICS_MENU
     return await analytics_back(update, context)
 
 async def show_standard_statistics(update, context):
@@ -115,23 +139,10 @@ async def show_standard_statistics(update, context):
     weekday = today.weekday()
     yesterday = today - timedelta(days=3 if weekday == 0 else 2 if weekday == 6 else 1)
 
-    sheet = get_sheet(context)
-    records = sheet.get_all_records()
-
-    def get_stats_for_date(date_obj):
-        formatted = date_obj.strftime("%d.%m.%y")
-        submitted = sum(1 for row in records if row.get("Дата", "") == formatted)
-        checked = sum(1 for row in records if row.get("Дата перевірки", "") == formatted)
-        approved = sum(1 for row in records if row.get("Дата перевірки", "") == formatted and row.get("Статус") == "✅ Погоджено")
-        rejected = sum(1 for row in records if row.get("Дата перевірки", "") == formatted and row.get("Статус") == "❌ Не погоджено")
-        return formatted, submitted, checked, approved, rejected
-
-    def count_pending():
-        return sum(1 for row in records if row.get("Статус") == "Очікує погодження")
-
-    t_fmt, t_sub, t_chk, t_app, t_rej = get_stats_for_date(today)
-    y_fmt, y_sub, y_chk, y_app, y_rej = get_stats_for_date(yesterday)
-    pending = count_pending()
+    t_fmt, y_fmt = today.strftime("%d.%m.%y"), yesterday.strftime("%d.%m.%y")
+    t_sub, t_chk, t_app, t_rej, _ = await _stats(context, daily_stats.day_stats, today.date())
+    y_sub, y_chk, y_app, y_rej, _ = await _stats(context, daily_stats.day_stats, yesterday.date())
+    pending = await _stats(context, daily_stats.pending_count)
 
     text = (
         f"📆 *Сьогодні* ({t_fmt}):\n"
@@ -145,12 +156,7 @@ async def show_standard_statistics(update, context):
 
 async def show_overall_statistics(update, context):
     try:
-        sheet = get_sheet(context)
-        records = sheet.get_all_records()
-        submitted = len(records)
-        checked = sum(1 for row in records if row.get("Дата перевірки", ""))
-        approved = sum(1 for row in records if row.get("Статус") == "✅ Погоджено")
-        rejected = sum(1 for row in records if row.get("Статус") == "❌ Не погоджено")
+        submitted, checked, approved, rejected, _ = await _stats(context, daily_stats.overall_stats)
 
         text = (
             f"📈 *Загальна статистика*\n\n"
@@ -160,10 +166,70 @@ async def show_overall_statistics(update, context):
             f"❌ Не погоджено: *{rejected}*"
         )
         await update.message.reply_text(text, parse_mode="Markdown")
-    except:
+    except Exception:
+        logger.exception("Загальна статистика")
         await update.message.reply_text("⚠️ Помилка при зчитуванні.")
     return STATISTICS_MENU
 
+# === Обробник "📤 Звіт" ===
+async def ask_report_start(update, context):
+    context.user_data.pop("report_period", None)
+    await update.message.reply_text(
+        "🗓 Введіть початкову дату звіту у форматі дд.мм.рр або оберіть «♾ За весь час»:",
+        reply_markup=report_period_keyboard,
+    )
+    return REPORT_PERIOD_START
+
+async def ask_report_end(update, context):
+    text = update.message.text.strip()
+    if text == "♾ За весь час":
+        context.user_data["report_period"] = reports.ALL_TIME
+        return await ask_report_format(update, context)
+    try:
+        context.user_data["report_start"] = datetime.strptime(text, "%d.%m.%y").date()
+    except ValueError:
+        await update.message.reply_text("❌ Невірний формат.")
+        return REPORT_PERIOD_START
+    await update.message.reply_text("📆 Тепер введіть кінцеву дату:")
+    return REPORT_PERIOD_END
+
+async def ask_report_format(update, context):
+    if "report_period" not in context.user_data:
+        try:
+            end = datetime.strptime(update.message.text.strip(), "%d.%m.%y").date()
+        except ValueError:
+            await update.message.reply_text("❌ Невірний формат.")
+            return REPORT_PERIOD_END
+        context.user_data["report_period"] = (context.user_data.pop("report_start"), end)
+    await update.message.reply_text("📎 Оберіть формат файлу:", reply_markup=report_format_keyboard)
+    return REPORT_FORMAT
+
+async def send_report(update, context):
+    fmt = REPORT_FORMATS.get(update.message.text.strip())
+    if fmt is None:
+        await update.message.reply_text("❗ Оберіть формат кнопкою.", reply_markup=report_format_keyboard)
+        return REPORT_FORMAT
+    start, end = context.user_data.pop("report_period")
+    sheet = sheet_title(context.user_data.get("mode"))
+    path = None
+    try:
+        await replica.ensure_ready(gateway)
+        await update.message.reply_text("⏳ Формую звіт...")
+        path, count = await asyncio.to_thread(reports.build_report, replica, sheet, start, end, fmt)
+        with open(path, "rb") as f:
+            await update.message.reply_document(
+                document=f,
+                filename=reports.report_filename(sheet, start, end, fmt),
+                caption=f"📤 Звіт «{sheet}»: {count} рядків",
+            )
+    except Exception:
+        logger.exception("Експорт звіту")
+        await update.message.reply_text("⚠️ Не вдалося сформувати звіт.")
+    finally:
+        if path:
+            os.remove(path)
+    return await analytics_back(update, context)
+
 async def analytics_back(update, context):
     keyboard = get_main_keyboard(context.user_data.get("mode"))
     await update.message.reply_text("🔙 Повернення назад...", reply_markup=keyboard)
@@ -184,6 +250,7 @@ analytics_conv = ConversationHandler(
             MessageHandler(filters.Regex("^📅 За період$"), ask_period_start),
             MessageHandler(filters.Regex("^📆 Сьогодні/вчора$"), show_standard_statistics),
             MessageHandler(filters.Regex("^📈 Загальна статистика$"), show_overall_statistics),
+            MessageHandler(filters.Regex("^📤 Звіт$"), ask_report_start),
             MessageHandler(filters.Regex("^⬅️ Назад$"), analytics_back),
         ],
         STATISTICS_PERIOD_START: [
@@ -191,9 +258,23 @@ analytics_conv = ConversationHandler(
         ],
         STATISTICS_PERIOD_END: [
             MessageHandler(filters.TEXT & ~filters.COMMAND, show_statistics_period)
-        ]
+        ],
+        REPORT_PERIOD_START: [
+            MessageHandler(filters.Regex("^⬅️ Назад$"), analytics_back),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, ask_report_end),
+        ],
+        REPORT_PERIOD_END: [
+            MessageHandler(filters.Regex("^⬅️ Назад$"), analytics_back),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, ask_report_format),
+        ],
+        REPORT_FORMAT: [
+            MessageHandler(filters.Regex("^⬅️ Назад$"), analytics_back),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, send_report),
+        ],
     },
     fallbacks=[MessageHandler(filters.Regex("^⬅️ Назад$"), analytics_back)],
+    name="analytics",
+    persistent=True,
     allow_reentry=True
 )
 
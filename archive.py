@@ -0,0 +1,276 @@
+import os
+import re
+import asyncio
+import logging
+import threading
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import gspread
+
+from columnar import DateParser
+import ipn_index
+from ipn_index import IpnEntry, normalize_ipn
+from local_db import LocalDb
+from replica import COLUMNS as REPLICA_COLUMNS
+from sheets import FIRST_DATA_ROW, SECURITY_SHEET, RETAIL_SHEET
+
+
+logger = logging.getLogger(__name__)
+
+# ====== НАЛАШТУВАННЯ ======
+ARCHIVE_PATH = os.getenv("Archive_Path", "archive.sqlite3")
+# рядки, вирішені й подані раніше ніж N днів тому, переносяться в архів; 0 — вимкнено.
+# Вмикається лише явно (напр. Archive_After_Days=365): перший прохід іде одразу після
+# запуску й видаляє з робочих листів усі такі рядки, переносячи їх у «<лист> <рік>».
+ARCHIVE_AFTER_DAYS = int(os.getenv("Archive_After_Days", "0"))
+ARCHIVE_INTERVAL = float(os.getenv("Archive_Interval", "86400"))
+# скільки рядків переноситься за один прохід
+ARCHIVE_BATCH = int(os.getenv("Archive_Batch", "5000"))
+
+ARCHIVE_SHEETS = [SECURITY_SHEET, RETAIL_SHEET]
+PENDING = "Очікує погодження"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived (
+    sheet TEXT NOT NULL,
+    ipn TEXT NOT NULL,
+    partition TEXT NOT NULL,
+    pib TEXT,
+    status TEXT,
+    PRIMARY KEY (sheet, ipn)
+);
+"""
+
+
+def partition_title(title: str, year: int) -> str:
+    """Архівний лист за рік: «Кандидати 2024»."""
+    return f"{title} {year}"
+
+
+def _row_key(row) -> tuple:
+    """Рядок для порівняння з архівним листом: без пробілів по краях і порожніх клітинок у кінці."""
+    key = [str(value).strip() for value in row]
+    while key and key[-1] == "":
+        key.pop()
+    return tuple(key)
+
+
+def _row_groups(numbers):
+    """Номери рядків → суцільні діапазони (від, до), знизу вгору — для deleteDimension."""
+    groups = []
+    for number in sorted(numbers):
+        if groups and groups[-1][1] == number - 1:
+            groups[-1][1] = number
+        else:
+            groups.append([number, number])
+    return [tuple(g) for g in reversed(groups)]
+
+
+# ====== АРХІВАТОР ======
+class Archiver:
+    """Переносить старі вирішені рядки з робочих листів у річні архівні листи.
+
+    Робочі листи лишаються малими; локальний індекс ІПН → архівний лист дає
+    перевірці дублів і статусів знайти архівного працівника без читання архівів.
+    У репліці перенесені рядки лишаються (з від'ємним номером), тож статистика
+    за минулі роки не змінюється.
+    """
+
+    def __init__(self, pool, replica=None, path: str = ARCHIVE_PATH,
+                 after_days: int = ARCHIVE_AFTER_DAYS, interval: float = ARCHIVE_INTERVAL):
+        self.pool = pool
+        self.replica = replica
+        self.after_days = after_days
+        self.interval = interval
+        self._db = LocalDb(path, SCHEMA)
+        self._lock = threading.Lock()
+        self._task = None
+        self.moved = 0
+
+    # --- індекс ---
+    def lookup_many(self, title: str, ipns) -> dict:
+        """ІПН → IpnEntry(None, ПІБ, Статус) для тих, хто є в архіві."""
+        ipns = list(ipns)
+        result = {}
+        with self._lock:
+            for i in range(0, len(ipns), 500):
+                chunk = ipns[i:i + 500]
+                rows = self._db.execute(
+                    "SELECT ipn, pib, status FROM archived WHERE sheet = ? AND ipn IN (%s)" % ",".join("?" * len(chunk)),
+                    (title, *chunk),
+                ).fetchall()
+                result.update((ipn, IpnEntry(None, pib, status)) for ipn, pib, status in rows)
+        return result
+
+    def _remember(self, title: str, entries):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO archived (sheet, ipn, partition, pib, status) VALUES (?, ?, ?, ?, ?)",
+                [(title, *entry) for entry in entries],
+            )
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM archived").fetchone()[0]
+
+    # --- перенесення ---
+    def archive_all(self) -> int:
+        """Один прохід по всіх листах. Блокуючий — викликати через gateway."""
+        if self.after_days <= 0:
+            return 0
+        cutoff = (date.today() - timedelta(days=self.after_days)).toordinal()
+        return sum(self.archive_sheet(title, cutoff) for title in ARCHIVE_SHEETS)
+
+    def archive_sheet(self, title: str, cutoff: int) -> int:
+        book = self.pool.spreadsheet()
+        ws = self.pool.worksheet(title)
+        values = ws.get_values()
+        if len(values) < FIRST_DATA_ROW:
+            return 0
+        header = [str(h).strip() for h in values[0]]
+        try:
+            pos_date, pos_pib, pos_ipn, pos_status = (header.index(n) for n in ("Дата", "ПІБ", "ІПН", "Статус"))
+        except ValueError:
+            logger.warning("Архів: у листі '%s' немає потрібних стовпців", title)
+            return 0
+
+        def cell(row, pos):
+            return row[pos] if pos < len(row) else ""
+
+        parse = DateParser()
+        candidates = []
+        for number, row in enumerate(values[1:], start=FIRST_DATA_ROW):
+            status, ipn = cell(row, pos_status), str(cell(row, pos_ipn)).strip()
+            if not ipn or not status or status == PENDING:
+                continue
+            ordinal = parse(cell(row, pos_date))
+            if 0 < ordinal < cutoff:
+                candidates.append((number, row, date.fromordinal(ordinal).year))
+                if len(candidates) >= ARCHIVE_BATCH:
+                    break
+        if not candidates:
+            return 0
+
+        # повторний прохід після збою: рядок, чия точна копія вже є в архівному листі,
+        # лише видаляється; кожна копія «погашає» один рядок, тож інші рядки з тим самим
+        # ІПН (інший рік подачі, інший статус) дописуються як звичайно
+        archived = {}
+        by_partition = defaultdict(list)
+        entries = []
+        for number, row, year in candidates:
+            ipn = normalize_ipn(cell(row, pos_ipn))
+            partition = partition_title(title, year)
+            if partition not in archived:
+                archived[partition] = self._archived_rows(partition)
+            key = _row_key(row)
+            if archived[partition][key]:
+                archived[partition][key] -= 1
+            else:
+                by_partition[partition].append(row)
+            entries.append((ipn, partition, cell(row, pos_pib), cell(row, pos_status)))
+
+        for partition, rows in by_partition.items():
+            self._partition(book, partition, values[0]).append_rows(rows)
+        self._remember(title, entries)
+
+        # рядки могли зсунутись (ручне сортування, видалення) — видаляємо лише ті, що на місці;
+        # під замком листа, щоб рішення перевіряючих не записались у зсунуті рядки
+        with self.pool.row_lock(title):
+            current = self.pool.read_columns(title, ("ІПН",))
+            numbers = [
+                number for number, row, _ in candidates
+                if number - FIRST_DATA_ROW < len(current)
+                and str(current[number - FIRST_DATA_ROW][0]).strip() == str(cell(row, pos_ipn)).strip()
+            ]
+            if len(numbers) != len(candidates):
+                logger.warning("Архів '%s': %d рядків зсунулось, буде повторено наступного разу",
+                               title, len(candidates) - len(numbers))
+            if not numbers:
+                return 0
+
+            if self.replica is not None:
+                self.replica.detach(title, numbers)
+            book.batch_update({"requests": [
+                {"deleteDimension": {"range": {
+                    "sheetId": ws.id, "dimension": "ROWS", "startIndex": start - 1, "endIndex": end,
+                }}}
+                for start, end in _row_groups(numbers)
+            ]})
+        self.moved += len(numbers)
+        # номери рядків змінились — індекс ІПН листа перебудовується
+        ipn_index.invalidate(title)
+        logger.info("Архів '%s': перенесено %d рядків у %s", title, len(numbers), ", ".join(sorted(by_partition)) or "—")
+        return len(numbers)
+
+    def _archived_rows(self, partition: str) -> Counter:
+        """Рядки архівного листа (без заголовка) → скільки разів кожен трапляється."""
+        try:
+            values = self.pool.worksheet(partition).get_values()
+        except gspread.exceptions.WorksheetNotFound:
+            return Counter()
+        return Counter(_row_key(row) for row in values[1:])
+
+    def _partition(self, book, partition: str, header: list):
+        try:
+            return self.pool.worksheet(partition)
+        except gspread.exceptions.WorksheetNotFound:
+            ws = book.add_worksheet(title=partition, rows=1, cols=len(header))
+            ws.update("A1", [header])
+            logger.info("Створено архівний лист '%s'", partition)
+            return ws
+
+    # --- відновлення ---
+    def partitions(self, title: str) -> list:
+        pattern = re.compile(rf"^{re.escape(title)} \d{{4}}$")
+        return [ws.title for ws in self.pool.spreadsheet().worksheets() if pattern.match(ws.title)]
+
+    def restore(self) -> int:
+        """Новий сервер: індекс і архівна частина репліки відновлюються з архівних листів."""
+        restored = 0
+        for title in ARCHIVE_SHEETS:
+            with self._lock:
+                known = self._db.execute("SELECT COUNT(*) FROM archived WHERE sheet = ?", (title,)).fetchone()[0]
+            need_replica = self.replica is not None and self.replica.is_ready() and not self.replica.archived_count(title)
+            if known and not need_replica:
+                continue
+            for partition in self.partitions(title):
+                rows = self.pool.read_columns(partition, REPLICA_COLUMNS)
+                if not known:
+                    fields = list(REPLICA_COLUMNS.values())
+                    ipn, pib, status = (fields.index(f) for f in ("ipn", "pib", "status"))
+                    self._remember(title, [
+                        (normalize_ipn(row[ipn]), partition, row[pib], row[status])
+                        for row in rows if str(row[ipn]).strip()
+                    ])
+                if need_replica:
+                    self.replica.add_archived(title, rows)
+                restored += len(rows)
+        if restored:
+            logger.info("Архів: відновлено %d рядків з архівних листів", restored)
+        return restored
+
+    # --- фонове завдання ---
+    async def run(self, gateway):
+        try:
+            if self.replica is not None:
+                await self.replica.ensure_ready(gateway)
+            await gateway.run(self.restore, kind="write")
+        except Exception:
+            logger.exception("Не вдалося відновити індекс архіву")
+        while True:
+            try:
+                await gateway.run(self.archive_all, kind="write", timeout=max(gateway.timeout, 300))
+            except Exception:
+                logger.exception("Не вдалося перенести рядки в архів")
+            await asyncio.sleep(self.interval)
+
+    def start(self, gateway):
+        if self._task is None and self.after_days > 0:
+            self._task = asyncio.create_task(self.run(gateway))
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
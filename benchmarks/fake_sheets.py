@@ -0,0 +1,297 @@
+import re
+import time
+import random
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from datetime import date, timedelta
+
+import gspread
+
+from bot import HEADERS
+from rnokpp import control_digit
+from sheets import SECURITY_SHEET, RETAIL_SHEET, charge_request
+
+
+# Охорона: A..I = Дата, ПІБ, ДН, ІПН, Статус, Дата перевірки, Перевіряючий, Коментар, Компанія
+SECURITY_HEADERS = [
+    "Дата", "ПІБ", "Дата народження", "ІПН", "Статус",
+    "Дата перевірки", "Перевіряючий", "Коментар", "Компанія",
+]
+LAYOUTS = {
+    SECURITY_SHEET: SECURITY_HEADERS,
+    RETAIL_SHEET: HEADERS,
+}
+
+STATUSES = ["✅ Погоджено"] * 45 + ["❌ Не погоджено"] * 35 + ["Очікує погодження"] * 20
+COMPANIES = ["Сокіл", "Варта", "Щит", "Беркут", "Легіон"]
+SURNAMES = ["Шевченко", "Коваленко", "Бондаренко", "Ткаченко", "Кравченко", "Олійник", "Мельник", "Лисенко"]
+NAMES = ["Іван Іванович", "Петро Петрович", "Олег Олегович", "Марія Іванівна", "Ольга Петрівна"]
+
+# мітка, до якої зараховуються виклики API (наприклад, сценарій навантажувального тесту)
+CALL_TAG = ContextVar("call_tag", default="background")
+
+# виклики, що в Google списують квоту запису; get_lastUpdateTime — Drive API, поза квотою Sheets
+WRITE_CALLS = {"append_rows", "update", "batch_update", "values_batch_update", "add_worksheet"}
+UNMETERED_CALLS = {"get_lastUpdateTime"}
+
+
+# ====== ДІАПАЗОНИ A1 ======
+_A1 = re.compile(r"^(?:'?(?P<sheet>[^'!]+)'?!)?(?P<c1>[A-Z]+)(?P<r1>\d*)(?::(?P<c2>[A-Z]+)(?P<r2>\d*))?$")
+
+
+def column_index(letters: str) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def parse_range(a1: str):
+    """'B2:E' → (рядок з, рядок по або None, стовпець з, стовпець по) — усе з 1."""
+    m = _A1.match(a1)
+    if m is None:
+        raise ValueError(f"Непідтримуваний діапазон: {a1}")
+    c1 = column_index(m["c1"])
+    c2 = column_index(m["c2"]) if m["c2"] else c1
+    r1 = int(m["r1"]) if m["r1"] else 1
+    r2 = int(m["r2"]) if m["r2"] else None
+    if not m["c2"] and m["r1"]:
+        r2 = r1
+    return r1, r2, c1, c2
+
+
+# ====== ФЕЙКОВІ ЛИСТИ ======
+class FakeWorksheet:
+    """Лист у пам'яті з тими методами gspread.Worksheet, якими користується бот.
+
+    Кожен виклик API рахується в `calls` і за потреби чекає `latency` секунд,
+    імітуючи мережевий запит до Google.
+    """
+
+    def __init__(self, title: str, rows: list, latency: float = 0.0, book=None, sheet_id: int = 0):
+        self.title = title
+        self.id = sheet_id
+        self.rows = rows
+        self.latency = latency
+        self.book = book
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _api(self, name: str):
+        charge_request("write" if name in WRITE_CALLS else "read")
+        self.calls[name] += 1
+        if self.book is not None:
+            self.book.calls[name] += 1
+            self.book.tagged[CALL_TAG.get()] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _range(self, a1: str, major_dimension: str = None) -> list:
+        r1, r2, c1, c2 = parse_range(a1)
+        with self._lock:
+            values = [row[c1 - 1:c2] for row in self.rows[r1 - 1:r2]]
+        if major_dimension == "COLUMNS":
+            values = [
+                [row[c] if c < len(row) else "" for row in values]
+                for c in range(c2 - c1 + 1)
+            ]
+            for column in values:
+                while column and column[-1] == "":
+                    column.pop()
+        # як і Google, порожні рядки (стовпці) в кінці діапазону не повертаються
+        while values and not any(values[-1]):
+            values.pop()
+        return [list(row) for row in values]
+
+    # --- читання ---
+    def get_values(self, range_name: str = None, **kwargs) -> list:
+        self._api("get_values")
+        values = self._range(range_name) if range_name else [list(row) for row in self.rows]
+        width = max((len(row) for row in values), default=0)
+        return [row + [""] * (width - len(row)) for row in values]
+
+    def get_all_values(self, **kwargs) -> list:
+        return self.get_values()
+
+    def batch_get(self, ranges, major_dimension: str = None, **kwargs) -> list:
+        self._api("batch_get")
+        return [self._range(a1, major_dimension) for a1 in ranges]
+
+    def row_values(self, row: int, **kwargs) -> list:
+        self._api("row_values")
+        with self._lock:
+            values = list(self.rows[row - 1]) if row <= len(self.rows) else []
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def get_all_records(self, head: int = 1, **kwargs) -> list:
+        self._api("get_all_records")
+        with self._lock:
+            header, rows = self.rows[head - 1], self.rows[head:]
+        return [dict(zip(header, row + [""] * (len(header) - len(row)))) for row in rows]
+
+    # --- запис ---
+    def append_row(self, values, **kwargs):
+        self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        self._api("append_rows")
+        with self._lock:
+            self.rows.extend(list(row) for row in values)
+        if self.book is not None:
+            self.book.touch()
+
+    def update(self, range_name: str, values, **kwargs):
+        self._api("update")
+        self._write(range_name, values)
+        if self.book is not None:
+            self.book.touch()
+
+    def _write(self, range_name: str, values):
+        r1, _, c1, _ = parse_range(range_name)
+        with self._lock:
+            for i, row in enumerate(values):
+                while len(self.rows) < r1 + i:
+                    self.rows.append([])
+                target = self.rows[r1 - 1 + i]
+                target.extend([""] * (c1 - 1 + len(row) - len(target)))
+                target[c1 - 1:c1 - 1 + len(row)] = row
+
+
+class FakeSpreadsheet:
+    """Таблиця в пам'яті: листи, values_batch_get і час останньої зміни."""
+
+    id = "benchmark"
+
+    def __init__(self, worksheets: dict, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.tagged = Counter()
+        self.revision = 0
+        self.sheets = {}
+        for title, rows in worksheets.items():
+            self.sheets[title] = FakeWorksheet(title, rows, latency, book=self, sheet_id=len(self.sheets))
+
+    def touch(self):
+        self.revision += 1
+
+    def _api(self, name: str):
+        if name not in UNMETERED_CALLS:
+            charge_request("write" if name in WRITE_CALLS else "read")
+        self.calls[name] += 1
+        self.tagged[CALL_TAG.get()] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self._api("worksheet")
+        if title not in self.sheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def add_worksheet(self, title: str, rows: int, cols: int, **kwargs) -> FakeWorksheet:
+        self._api("add_worksheet")
+        ws = self.sheets[title] = FakeWorksheet(title, [], self.latency, book=self, sheet_id=len(self.sheets))
+        return ws
+
+    def batch_update(self, body: dict) -> dict:
+        """Підтримується лише deleteDimension по рядках."""
+        self._api("batch_update")
+        by_id = {ws.id: ws for ws in self.sheets.values()}
+        for request in body.get("requests", []):
+            target = request["deleteDimension"]["range"]
+            ws = by_id[target["sheetId"]]
+            with ws._lock:
+                del ws.rows[target["startIndex"]:target["endIndex"]]
+        self.touch()
+        return {"replies": []}
+
+    def values_batch_update(self, params=None, body=None) -> dict:
+        self._api("values_batch_update")
+        for value_range in (body or {}).get("data", []):
+            title, _, cells = value_range["range"].partition("!")
+            self.sheets[title.strip("'")]._write(cells, value_range["values"])
+        self.touch()
+        return {"totalUpdatedRanges": len((body or {}).get("data", []))}
+
+    def worksheets(self) -> list:
+        self._api("worksheets")
+        return list(self.sheets.values())
+
+    def get_lastUpdateTime(self) -> str:
+        self._api("get_lastUpdateTime")
+        return f"rev-{self.revision}"
+
+    def values_batch_get(self, ranges, params=None) -> dict:
+        self._api("values_batch_get")
+        major_dimension = (params or {}).get("majorDimension")
+        value_ranges = []
+        for a1 in ranges:
+            title, _, cells = a1.partition("!")
+            ws = self.sheets[title.strip("'")]
+            values = ws._range(cells, major_dimension) if cells else [list(row) for row in ws.rows]
+            value_ranges.append({"range": a1, "majorDimension": major_dimension or "ROWS", "values": values})
+        return {"spreadsheetId": self.id, "valueRanges": value_ranges}
+
+
+class FakeClient:
+    """Замінник gspread.Client для SheetsPool: відкриває одну фейкову таблицю."""
+
+    auth = None
+
+    def __init__(self, book: FakeSpreadsheet):
+        self.book = book
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        return self.book
+
+    def open(self, title: str) -> FakeSpreadsheet:
+        return self.book
+
+
+# ====== СИНТЕТИЧНІ ДАНІ ======
+def make_ipn(birth_days: int, serial: int) -> str:
+    """Коректний РНОКПП: 5 цифр дати народження, 4 — порядковий номер, контрольна цифра."""
+    body = f"{birth_days:05d}{serial % 10_000:04d}"
+    return body + str(control_digit(body))
+
+
+def generate_rows(title: str, count: int, seed: int = 0, days: int = 730) -> list:
+    """Заголовок + `count` рядків у форматі листа; дати — за останні `days` днів.
+
+    Повторювані значення (дати, статуси, ПІБ) — спільні об'єкти рядків,
+    тож 500 тис. рядків займають пам'ять, близьку до справжньої відповіді API.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    day_strings = [(today - timedelta(days=d)).strftime("%d.%m.%y") for d in range(days)]
+    birthdates = [(date(1960, 1, 1) + timedelta(days=d)).strftime("%d.%m.%Y") for d in range(0, 15000, 7)]
+    people = [f"{s} {n}" for s in SURNAMES for n in NAMES]
+    security = title == SECURITY_SHEET
+
+    rows = [list(LAYOUTS[title])]
+    for i in range(count):
+        # старіші рядки — вгорі, як у справжній таблиці
+        age = days - 1 - i * days // max(count, 1)
+        status = rng.choice(STATUSES)
+        pending = status == "Очікує погодження"
+        checked = "" if pending else day_strings[max(age - rng.randint(0, 3), 0)]
+        # народжені в 1965–1975 роках; кожен лист — свій діапазон
+        ipn = make_ipn(24_000 + seed * 500 + i // 10_000, i)
+        row = [day_strings[age], rng.choice(people), rng.choice(birthdates), ipn, status]
+        if security:
+            row += [checked, "" if pending else "Перевіряючий", "", rng.choice(COMPANIES)]
+        else:
+            row += ["" if pending else "Перевіряючий", ""]
+        rows.append(row)
+    return rows
+
+
+def build_spreadsheet(count: int, latency: float = 0.0) -> FakeSpreadsheet:
+    """Обидва листи по `count` рядків."""
+    return FakeSpreadsheet({
+        SECURITY_SHEET: generate_rows(SECURITY_SHEET, count, seed=1),
+        RETAIL_SHEET: generate_rows(RETAIL_SHEET, count, seed=2),
+    }, latency=latency)
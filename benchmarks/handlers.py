@@ -0,0 +1,200 @@
+"""Бенчмарк обробників бота на фейковій таблиці в пам'яті.
+
+Запуск із кореня репозиторію (мережа й Google не потрібні):
+
+    python -m benchmarks.handlers
+    python -m benchmarks.handlers --rows 1000,10000 --latency 0.2 --repeat 5
+
+Для кожного розміру листа та обробника виводиться: час першого (холодного)
+виклику, медіана наступних, кількість викликів API та пікова пам'ять
+холодного виклику (tracemalloc, окремим проходом — щоб не спотворювати час).
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import analytics_menu
+import bot
+import review_menu
+import ipn_index
+from archive import Archiver
+from notifications import StatusNotifier
+from replica import Replica
+from review import ReviewQueue
+from sheets import RETAIL_SHEET, SHEET_TITLES, SheetsGateway, SheetsPool
+from snapshot import CacheSnapshot
+from write_queue import WriteQueue
+
+from benchmarks.fake_sheets import FakeClient, build_spreadsheet, make_ipn
+
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 500_000]
+CHECK_BATCH = 50
+
+
+# ====== ФЕЙКОВИЙ TELEGRAM ======
+class FakeMessage:
+    def __init__(self, text: str):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+    async def reply_document(self, document=None, **kwargs):
+        self.replies.append(kwargs.get("caption"))
+
+
+class FakeUpdate:
+    def __init__(self, text: str, chat_id: int = 1):
+        self.message = FakeMessage(text)
+        self.effective_chat = self.effective_user = type("Chat", (), {"id": chat_id})()
+
+
+class FakeContext:
+    def __init__(self, **user_data):
+        self.user_data = dict(user_data)
+        self.chat_data = {}
+        self.bot_data = {}
+
+
+# ====== ОТОЧЕННЯ ======
+def install(book, workdir: str, tag: str, modules=(), throttle: bool = False):
+    """Підміняє синглтони bot / analytics_menu на пул, що працює з фейковою таблицею.
+
+    modules — інші модулі, що імпортували синглтони через from bot import (напр. main);
+    throttle — залишити справжні хвилинні квоти Sheets.
+    """
+    singletons = {
+        "sheets": SheetsPool(FakeClient(book), key=book.id),
+        # квоти вимкнено: міряється сам обробник, а не очікування token bucket
+        "gateway": SheetsGateway() if throttle else SheetsGateway(reads_per_minute=10 ** 9, writes_per_minute=10 ** 9),
+    }
+    pool = singletons["sheets"]
+    singletons["journal"] = WriteQueue(pool, path=os.path.join(workdir, f"journal-{tag}.sqlite3"))
+    singletons["replica"] = Replica(pool, path=os.path.join(workdir, f"replica-{tag}.sqlite3"))
+    singletons["notifier"] = StatusNotifier(pool, path=os.path.join(workdir, f"notify-{tag}.sqlite3"))
+    singletons["archive"] = Archiver(
+        pool, singletons["replica"], path=os.path.join(workdir, f"archive-{tag}.sqlite3")
+    )
+
+    singletons["reviews"] = ReviewQueue(pool, path=os.path.join(workdir, f"review-{tag}.sqlite3"))
+    singletons["snapshot"] = CacheSnapshot(
+        bot.index_for, SHEET_TITLES.values(), path=os.path.join(workdir, f"snapshot-{tag}.sqlite3")
+    )
+
+    ipn_index._indexes.clear()
+    for module in (bot, analytics_menu, review_menu, *modules):
+        for name, value in singletons.items():
+            if hasattr(module, name):
+                setattr(module, name, value)
+    return singletons
+
+
+def uninstall(singletons: dict):
+    singletons["gateway"].shutdown()
+    for name in ("journal", "replica", "notifier", "archive", "reviews", "snapshot"):
+        singletons[name]._db.close()
+
+
+def scenarios(book):
+    """Назва → фабрика корутини для i-го повтору."""
+    existing = [row[3] for row in book.sheets[RETAIL_SHEET].rows[1::97]][:CHECK_BATCH // 2]
+    today = date.today()
+
+    def enter_ipn(i):
+        ctx = FakeContext(mode="retail", pib="Бенчмарк Тест Тестович")
+        return bot.enter_ipn(FakeUpdate(make_ipn(33_000, i)), ctx)
+
+    def check_ipn(i):
+        missing = [make_ipn(34_000, i * CHECK_BATCH + n) for n in range(CHECK_BATCH - len(existing))]
+        return bot.check_ipn(FakeUpdate(" ".join(existing + missing)), FakeContext(mode="retail"))
+
+    def statistics_period(i):
+        ctx = FakeContext(mode="retail", stat_start=datetime.combine(today - timedelta(days=90), datetime.min.time()))
+        return analytics_menu.show_statistics_period(FakeUpdate(today.strftime("%d.%m.%y")), ctx)
+
+    def standard_statistics(i):
+        return analytics_menu.show_standard_statistics(FakeUpdate("📆 Сьогодні/вчора"), FakeContext(mode="retail"))
+
+    return {
+        "enter_ipn": enter_ipn,
+        "check_ipn": check_ipn,
+        "show_statistics_period": statistics_period,
+        "show_standard_statistics": standard_statistics,
+    }
+
+
+# ====== ВИМІРЮВАННЯ ======
+async def _timed(book, coro):
+    before = sum(book.calls.values())
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started, sum(book.calls.values()) - before
+
+
+async def measure(book, workdir: str, repeat: int) -> dict:
+    results = {}
+    # свої файли SQLite на кожен розмір — репліка не має перейти з попереднього
+    workdir = tempfile.mkdtemp(dir=workdir)
+
+    env = install(book, workdir, "time")
+    for name, make in scenarios(book).items():
+        runs = [await _timed(book, make(i)) for i in range(repeat)]
+        warm = runs[1:] or runs
+        results[name] = {
+            "cold_ms": runs[0][0] * 1000,
+            "warm_ms": statistics.median(t for t, _ in warm) * 1000,
+            "cold_calls": runs[0][1],
+            "warm_calls": statistics.median(c for _, c in warm),
+        }
+    uninstall(env)
+
+    # пам'ять — окремим проходом на свіжому оточенні (холодний виклик)
+    env = install(book, workdir, "memory")
+    tracemalloc.start()
+    try:
+        for name, make in scenarios(book).items():
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            await make(repeat)
+            results[name]["peak_kib"] = (tracemalloc.get_traced_memory()[1] - base) / 1024
+    finally:
+        tracemalloc.stop()
+        uninstall(env)
+    return results
+
+
+def report(size: int, results: dict):
+    print(f"\n== {size:,} рядків на лист ==".replace(",", " "))
+    print(f"{'обробник':<26}{'холодний, мс':>14}{'теплий, мс':>12}{'API хол.':>10}{'API тепл.':>11}{'пік, КіБ':>11}")
+    for name, r in results.items():
+        print(
+            f"{name:<26}{r['cold_ms']:>14.1f}{r['warm_ms']:>12.2f}"
+            f"{r['cold_calls']:>10}{r['warm_calls']:>11g}{r['peak_kib']:>11.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="розміри листів через кому (за замовчуванням 1k,10k,100k,500k)")
+    parser.add_argument("--latency", type=float, default=0.0, help="затримка кожного виклику API, с")
+    parser.add_argument("--repeat", type=int, default=5, help="повторів кожного обробника")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory(prefix="bot-bench-") as workdir:
+        for size in (int(s) for s in args.rows.split(",")):
+            book = build_spreadsheet(size, latency=args.latency)
+            report(size, asyncio.run(measure(book, workdir, max(args.repeat, 1))))
+
+
+if __name__ == "__main__":
+    main()
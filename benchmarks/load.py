@@ -0,0 +1,405 @@
+"""Навантажувальний тест бота: справжній Application проти локального фейкового Bot API.
+
+Запуск із кореня репозиторію (мережа, Telegram і Google не потрібні):
+
+    python -m benchmarks.load
+    python -m benchmarks.load --users 200 --iterations 3 --rows 100000 --latency 0.2
+    python -m benchmarks.load --users 100 --max-p95 1500      # для гейту релізу
+
+Application будується тим самим main.build_application, що й у продакшні
+(ChatOrderedApplication, персистентність, обидва ConversationHandler), і отримує
+апдейти через getUpdates від локального HTTP-сервера. Таблицю замінює фейкова
+в пам'яті (benchmarks.fake_sheets) із заданою затримкою кожного виклику.
+
+Кожен віртуальний користувач проходить сценарії login → add_worker →
+check_status → analytics з паузами на «обдумування». Латентність кроку — час
+від появи апдейту в getUpdates до першої відповіді бота в цей чат. Виклики
+Sheets зараховуються сценарію, під час кроку якого їх зроблено; решта —
+фоновим завданням (журнал записів, репліка, архів, прогрів).
+
+Код виходу 1 — були тайм-аути або p95 перевищив --max-p95.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+import contextvars
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+import main
+from bot import RETAIL_PASSWORD, SECURITY_PASSWORD
+from persistence import SqlitePersistence
+from sheets import RETAIL_SHEET, SECURITY_SHEET, SHEETS_WORKERS
+
+from benchmarks.fake_sheets import CALL_TAG, build_spreadsheet, make_ipn
+from benchmarks.handlers import install, uninstall
+
+
+TOKEN = "123456:load-test"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Load", "username": "load_test_bot"}
+# методи, відповідь якими користувач бачить у чаті
+REPLY_METHODS = {"sendMessage", "sendDocument", "editMessageText"}
+POLL_TIMEOUT = 10
+FLOW_NAMES = ["login", "add_worker", "check_status", "analytics"]
+CHECK_SAMPLE = 5
+
+
+# ====== ФЕЙКОВИЙ BOT API ======
+class FakeBotApi:
+    """Мінімальний HTTP/1.1-сервер з тими методами Bot API, якими користується бот.
+
+    Апдейти віддаються через getUpdates (long polling), на send* / edit*
+    повертається правдоподібне Message, решта методів — просто true.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self.on_reply = None
+        self.port = None
+        self._server = None
+        self._updates = []
+        self._new = asyncio.Event()
+        self._next_update = 1
+        self._next_message = 1
+
+    async def start(self, host: str = "127.0.0.1"):
+        self._server = await asyncio.start_server(self._serve, host, 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        # незавершені long polling запити повертаються одразу
+        self._new.set()
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    # --- апдейти ---
+    def push_text(self, chat_id: int, text: str) -> int:
+        """Кладе повідомлення користувача в чергу getUpdates → update_id."""
+        message = self._message(chat_id, text, sender={"id": chat_id, "is_bot": False, "first_name": f"User{chat_id}"})
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        update_id = self._next_update
+        self._next_update += 1
+        self._updates.append({"update_id": update_id, "message": message})
+        self._new.set()
+        return update_id
+
+    async def _get_updates(self, offset: int, timeout: float, limit: int) -> list:
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new.clear()
+            try:
+                await asyncio.wait_for(self._new.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    def _message(self, chat_id: int, text: str, sender: dict = None) -> dict:
+        message = {
+            "message_id": self._next_message,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": sender or BOT_USER,
+            "text": text,
+        }
+        self._next_message += 1
+        return message
+
+    # --- HTTP ---
+    async def _handle(self, method: str, params: dict):
+        self.calls[method] += 1
+        if method == "getUpdates":
+            return await self._get_updates(
+                int(params.get("offset") or 0), float(params.get("timeout") or 0), int(params.get("limit") or 100)
+            )
+        if method == "getMe":
+            return BOT_USER
+        if method in REPLY_METHODS:
+            chat_id = int(params["chat_id"])
+            if self.on_reply is not None:
+                self.on_reply(chat_id)
+            return self._message(chat_id, params.get("text") or params.get("caption") or "")
+        return True
+
+    @staticmethod
+    def _params(content_type: str, body: bytes) -> dict:
+        if content_type.startswith("multipart/form-data"):
+            # файли не потрібні — лише прості поля (chat_id, caption)
+            fields = re.findall(rb'name="([^"]+)"\r\n(?:[^\r\n]+\r\n)*\r\n([^\r\n]*)\r\n--', body)
+            return {name.decode(): value.decode("utf-8", "replace") for name, value in fields}
+        return {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+                method = request_line.split()[1].rsplit("/", 1)[-1]
+                result = await self._handle(method, self._params(headers.get("content-type", ""), body))
+                payload = json.dumps({"ok": True, "result": result}).encode("utf-8")
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n" % len(payload)
+                    + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # клієнт закрив з'єднання або цикл подій завершується
+            pass
+        finally:
+            writer.close()
+
+
+# ====== ВИМІРЮВАННЯ КРОКІВ ======
+class Step:
+    def __init__(self, flow: str):
+        self.flow = flow
+        self.sent = time.perf_counter()
+        self.replied = None
+        self.finished = None
+        self.done = asyncio.get_running_loop().create_future()
+
+    @property
+    def latency(self) -> float:
+        return (self.replied or self.finished) - self.sent
+
+
+class Recorder:
+    """Пов'язує апдейти з кроками сценаріїв.
+
+    Обробник групи -1 позначає початок обробки апдейту (і мітку для викликів
+    Sheets), обробник останньої групи — кінець. Чат обробляється строго по
+    черзі, тож відповідь у чат між ними належить саме цьому кроку.
+    """
+
+    def __init__(self):
+        self.steps = {}
+        self.current = {}
+        self.latencies = defaultdict(list)
+        self.timeouts = Counter()
+        self.runs = Counter()
+
+    def expect(self, update_id: int, flow: str) -> Step:
+        self.steps[update_id] = Step(flow)
+        return self.steps[update_id]
+
+    async def begin(self, update, context):
+        step = self.steps.get(update.update_id)
+        if step is None or update.effective_chat is None:
+            return
+        self.current[update.effective_chat.id] = step
+        # копія контексту задачі апдейту — мітка діє лише на виклики цього кроку
+        CALL_TAG.set(step.flow)
+
+    async def end(self, update, context):
+        step = self.steps.pop(update.update_id, None)
+        if step is None:
+            return
+        if update.effective_chat is not None and self.current.get(update.effective_chat.id) is step:
+            del self.current[update.effective_chat.id]
+        step.finished = time.perf_counter()
+        if not step.done.done():
+            step.done.set_result(None)
+
+    def reply(self, chat_id: int):
+        step = self.current.get(chat_id)
+        if step is not None and step.replied is None:
+            step.replied = time.perf_counter()
+
+
+class ContextExecutor(ThreadPoolExecutor):
+    """Пул потоків, що переносить contextvars — виклики Sheets зберігають мітку сценарію."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+# ====== ВІРТУАЛЬНІ КОРИСТУВАЧІ ======
+def flows(user: int, iteration: int, existing: dict) -> list:
+    """(сценарій, [повідомлення]) для однієї ітерації; парні користувачі — магазини, непарні — охорона."""
+    security = user % 2 == 1
+    title = SECURITY_SHEET if security else RETAIL_SHEET
+    ipn = make_ipn(30_000 + user % 4_000, user // 4_000 * 100 + iteration)
+    rng = random.Random(user * 1000 + iteration)
+
+    result = []
+    if iteration == 0:
+        login = ["/start", "🛡 Охорона", SECURITY_PASSWORD, f"Навантаження {user}"] if security else \
+            ["/start", "🏬 Магазини / Логістика", RETAIL_PASSWORD]
+        result.append(("login", login))
+    result += [
+        ("add_worker", ["➕ Додати працівника", f"Тестовий Працівник {user}", ipn]),
+        ("check_status", ["📋 Перевірити статус", " ".join(rng.sample(existing[title], CHECK_SAMPLE) + [ipn])]),
+        ("analytics", ["📊 Аналітика", "📊 Статистика", "📆 Сьогодні/вчора", "⬅️ Назад"]),
+    ]
+    return result
+
+
+async def virtual_user(api: FakeBotApi, recorder: Recorder, user: int, existing: dict, args):
+    rng = random.Random(user)
+    chat_id = 10_000 + user
+    # користувачі підключаються рівномірно протягом --ramp секунд
+    await asyncio.sleep(args.ramp * user / max(args.users, 1))
+    for iteration in range(args.iterations):
+        for flow, texts in flows(user, iteration, existing):
+            for text in texts:
+                await asyncio.sleep(rng.uniform(*args.think))
+                step = recorder.expect(api.push_text(chat_id, text), flow)
+                try:
+                    await asyncio.wait_for(asyncio.shield(step.done), args.timeout)
+                except asyncio.TimeoutError:
+                    recorder.timeouts[flow] += 1
+                    continue
+                recorder.latencies[flow].append(step.latency)
+            recorder.runs[flow] += 1
+
+
+# ====== ЗАПУСК ======
+async def run_load(args) -> dict:
+    book = build_spreadsheet(args.rows, latency=args.latency)
+    existing = {
+        title: [row[3] for row in book.sheets[title].rows[1:]][::max(args.rows // 500, 1)]
+        for title in (SECURITY_SHEET, RETAIL_SHEET)
+    }
+    with tempfile.TemporaryDirectory(prefix="bot-load-") as workdir:
+        env = install(book, workdir, "load", modules=(main,), throttle=args.quotas)
+        env["gateway"]._executor.shutdown()
+        env["gateway"]._executor = ContextExecutor(max_workers=SHEETS_WORKERS, thread_name_prefix="sheets")
+
+        api = FakeBotApi()
+        await api.start()
+        recorder = Recorder()
+        api.on_reply = recorder.reply
+
+        os.environ["Telegram_Token"] = TOKEN
+        app = main.build_application(
+            base_url=api.base_url, persistence=SqlitePersistence(path=os.path.join(workdir, "persistence.sqlite3"))
+        )
+        app.add_handler(TypeHandler(Update, recorder.begin), group=-1)
+        app.add_handler(TypeHandler(Update, recorder.end), group=max(app.handlers) + 1)
+
+        # той самий порядок, що й у run_polling
+        await app.initialize()
+        await app.post_init(app)
+        await app.updater.start_polling(poll_interval=0, timeout=POLL_TIMEOUT)
+        await app.start()
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(virtual_user(api, recorder, user, existing, args) for user in range(args.users)))
+        finally:
+            elapsed = time.perf_counter() - started
+            await app.updater.stop()
+            await app.stop()
+            await app.shutdown()
+            await app.post_shutdown(app)
+            await api.stop()
+            uninstall(env)
+
+    return {
+        "elapsed": elapsed,
+        "recorder": recorder,
+        "sheets": dict(book.tagged),
+        "sheets_by_method": dict(book.calls),
+        "bot_api": dict(api.calls),
+    }
+
+
+# ====== ЗВІТ ======
+def percentiles(values: list) -> tuple:
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def report(args, results: dict) -> float:
+    """Друкує таблицю результатів → загальний p95, мс."""
+    recorder, elapsed = results["recorder"], results["elapsed"]
+    everything = [t for flow in FLOW_NAMES for t in recorder.latencies[flow]]
+    steps = len(everything)
+    timeouts = sum(recorder.timeouts.values())
+
+    rows = f"{args.rows:,}".replace(",", " ")
+    print(f"\n== {args.users} користувачів × {args.iterations} ітер., {rows} рядків на лист, затримка Sheets {args.latency} с ==")
+    print(f"тривалість {elapsed:.1f} с, кроків {steps}, {steps / elapsed:.1f} кроків/с, тайм-аутів {timeouts}")
+    print(
+        f"{'сценарій':<18}{'запусків':>9}{'кроків':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}"
+        f"{'макс, мс':>10}{'Sheets':>8}{'на запуск':>11}"
+    )
+    for flow in FLOW_NAMES:
+        values = recorder.latencies[flow]
+        p50, p95, p99 = percentiles(values)
+        calls = results["sheets"].get(flow, 0)
+        runs = recorder.runs[flow]
+        print(
+            f"{flow:<18}{runs:>9}{len(values):>8}{p50 * 1000:>10.0f}{p95 * 1000:>10.0f}{p99 * 1000:>10.0f}"
+            f"{max(values, default=0) * 1000:>10.0f}{calls:>8}{calls / max(runs, 1):>11.1f}"
+        )
+    p50, p95, p99 = percentiles(everything)
+    print(
+        f"{'усього':<18}{sum(recorder.runs.values()):>9}{steps:>8}{p50 * 1000:>10.0f}{p95 * 1000:>10.0f}"
+        f"{p99 * 1000:>10.0f}{max(everything, default=0) * 1000:>10.0f}"
+        f"{sum(v for k, v in results['sheets'].items() if k in FLOW_NAMES):>8}"
+    )
+    print(f"{'фонові завдання':<75}{results['sheets'].get('background', 0):>8}")
+    print("Sheets за методами: " + ", ".join(f"{k} {v}" for k, v in sorted(results["sheets_by_method"].items())))
+    print("Bot API: " + ", ".join(f"{k} {v}" for k, v in sorted(results["bot_api"].items())))
+    return p95 * 1000
+
+
+def think_range(value: str) -> tuple:
+    low, _, high = value.partition(",")
+    return float(low), float(high or low)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="віртуальних користувачів")
+    parser.add_argument("--iterations", type=int, default=2, help="повторів add_worker → check_status → analytics")
+    parser.add_argument("--rows", type=int, default=10_000, help="рядків на лист")
+    parser.add_argument("--latency", type=float, default=0.05, help="затримка кожного виклику Sheets, с")
+    parser.add_argument("--think", type=think_range, default=(0.2, 1.0), help="пауза між кроками «мін,макс», с")
+    parser.add_argument("--ramp", type=float, default=5.0, help="за скільки секунд підключаються всі користувачі")
+    parser.add_argument("--timeout", type=float, default=30.0, help="тайм-аут відповіді на крок, с")
+    parser.add_argument("--quotas", action="store_true", help="справжні хвилинні квоти Sheets замість необмежених")
+    parser.add_argument("--max-p95", type=float, default=None, help="поріг p95 усіх кроків, мс (код виходу 1)")
+    args = parser.parse_args()
+
+    # main вмикає INFO під час імпорту — у звіті лишаються лише попередження
+    logging.getLogger().setLevel(logging.WARNING)
+    results = asyncio.run(run_load(args))
+    p95 = report(args, results)
+    failed = []
+    timeouts = sum(results["recorder"].timeouts.values())
+    if timeouts:
+        failed.append(f"тайм-аутів: {timeouts}")
+    if args.max_p95 is not None and p95 > args.max_p95:
+        failed.append(f"p95 {p95:.0f} мс > {args.max_p95:.0f} мс")
+    if failed:
+        print("ПРОВАЛ: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
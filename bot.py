@@ -1,37 +1,54 @@
 import os
-import json
 import logging
-from datetime import date, datetime, timedelta
+from datetime import datetime
 
 from telegram import Update, ReplyKeyboardMarkup
-from telegram.ext import (
-    ApplicationBuilder, CommandHandler, MessageHandler,
-    ContextTypes, ConversationHandler, filters
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes
+
+from sheets import (
+    SheetsPool, SheetsGateway, SHEETS_ERRORS, SPREADSHEET_KEY, SHEET_TITLES, SECURITY_SHEET, RETAIL_SHEET, sheet_title,
 )
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from ipn_index import get_cross_index, get_index, normalize_ipn
+from write_queue import WriteQueue
+from replica import Replica
+from notifications import StatusNotifier
+from archive import Archiver
+from review import ReviewQueue
+from snapshot import CacheSnapshot
+from rnokpp import birth_date, birth_date_ok, checksum_ok, MIN_AGE, MAX_AGE
 
 
 # ====== ПАРОЛІ ДОСТУПУ ======
 SECURITY_PASSWORD = "secr5541"
 RETAIL_PASSWORD = "retl4478"
-
-# Logging
-logging.basicConfig(level=logging.INFO)
+# режим перевіряючого вимкнено, поки пароль не задано в оточенні
+REVIEWER_PASSWORD = os.getenv("Reviewer_Password")
 
 # ====== СТАНИ ======
-SELECT_DIRECTION, ASK_PASSWORD, ASK_COMPANY, CHOOSING, ENTER_NAME, ENTER_IPN, CHECK_STATUS = range(7)
+SELECT_DIRECTION, ASK_PASSWORD, ASK_COMPANY, CHOOSING, ENTER_NAME, ENTER_IPN, CHECK_STATUS, REVIEWING = range(8)
 
 # ====== КЛАВІАТУРИ ======
 direction_keyboard = ReplyKeyboardMarkup([
     ["🏬 Магазини / Логістика"],
-    ["🛡 Охорона"]
+    ["🛡 Охорона"],
+    ["🔎 Перевіряючий"]
 ], resize_keyboard=True)
 
 cancel_keyboard = ReplyKeyboardMarkup([
     ["❌ Скасувати"]
 ], resize_keyboard=True)
 
+review_keyboard = ReplyKeyboardMarkup([
+    ["📝 На перевірці"],
+    ["⬅️ Змінити напрямок"]
+], resize_keyboard=True)
+
+check_keyboard = ReplyKeyboardMarkup([
+    ["🌐 Усі напрямки"],
+    ["❌ Скасувати"]
+], resize_keyboard=True)
+
 
 def get_main_keyboard(mode: str):
     return ReplyKeyboardMarkup([
@@ -42,10 +59,36 @@ def get_main_keyboard(mode: str):
 
 
 # ====== GOOGLE SHEETS ======
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds_dict = json.loads(os.getenv("Google_Creds_Json"))
-creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-client = gspread.authorize(creds)
+# авторизація в Google — при першому зверненні до таблиці, не під час імпорту
+sheets = SheetsPool(key=SPREADSHEET_KEY)
+gateway = SheetsGateway()
+journal = WriteQueue(sheets)
+replica = Replica(sheets)
+notifier = StatusNotifier(sheets)
+archive = Archiver(sheets, replica)
+reviews = ReviewQueue(sheets)
+
+# ====== ПОВІДОМЛЕННЯ ======
+MESSAGE_LIMIT = 4096
+# більше рядків — відповідь надсилається файлом
+CHECK_FILE_THRESHOLD = 150
+
+STATUS_KINDS = {
+    "approved": "✅ Погоджено",
+    "rejected": "❌ Не погоджено",
+    "pending": "⏳ Очікує погодження",
+    "other": "ℹ️ Інше",
+    "invalid": "⚠️ Невірний ІПН",
+    "not_found": "🔍 Не знайдено",
+}
+
+DIRECTION_LABELS = {
+    SECURITY_SHEET: "🛡 Охорона",
+    RETAIL_SHEET: "🏬 Магазини / Логістика",
+}
+
+# для зведення по кількох напрямках ІПН рахується за найгіршим статусом
+KIND_PRIORITY = ["rejected", "pending", "other", "approved"]
 
 HEADERS = ["Дата", "ПІБ", "Дата народження", "ІПН", "Статус", "Перевіряючий", "Коментар"]
 
@@ -53,10 +96,46 @@ HEADERS = ["Дата", "ПІБ", "Дата народження", "ІПН", "С
 def get_sheet(context):
     """Повертає відповідний лист залежно від режиму."""
     mode = context.user_data.get("mode", "retail")
-    book = client.open("Перевірка аутсорс")
-    if mode == "security":
-        return book.worksheet("Охорона")
-    return book.worksheet("Кандидати")
+    return sheets.for_mode(mode)
+
+
+def index_for(title: str):
+    """Індекс ІПН листа (разом з архівом цього листа)."""
+    return get_index(sheets, title, archive)
+
+
+# індекси ІПН на диску — після перезапуску пошук працює без повного читання листів
+snapshot = CacheSnapshot(index_for, SHEET_TITLES.values())
+
+
+def get_ipn_index(context):
+    """Індекс ІПН листа поточного режиму."""
+    mode = context.user_data.get("mode", "retail")
+    return index_for(sheet_title(mode))
+
+
+def cross_index():
+    """Індекси обох листів, що оновлюються одним запитом."""
+    return get_cross_index(sheets, SHEET_TITLES.values(), archive)
+
+
+SHEETS_UNAVAILABLE_TEXT = "⚠️ Таблиця тимчасово недоступна. Спробуйте пізніше."
+STALE_DATA_TEXT = "⚠️ Таблиця тимчасово недоступна — дані можуть бути застарілими."
+
+
+async def refresh_or_stale(source) -> bool:
+    """Оновлює індекс → True, якщо таблиця недоступна і відповідь буде з наявних у пам'яті даних.
+
+    Помилку таблиці пропускає далі лише тоді, коли індекс ще жодного разу не читався.
+    """
+    try:
+        await gateway.run(source.refresh)
+    except SHEETS_ERRORS as e:
+        if not source.ready:
+            raise
+        logging.warning("Таблиця недоступна, відповідь з індексу в пам'яті: %s", e)
+        return True
+    return False
 
 
 # ====== UTILS ======
@@ -69,15 +148,68 @@ def proper_case(text: str) -> str:
 
 
 def calculate_birthdate(ipn: str) -> str:
-    try:
-        base = date(1900, 1, 1)
-        return (base + timedelta(days=int(ipn[:5]) - 1)).strftime("%d.%m.%Y")
-    except Exception:
-        return ""
-
-
-def normalize_ipn(ipn: str) -> str:
-    return str(ipn).strip().zfill(10)
+    born = birth_date(ipn)
+    return born.strftime("%d.%m.%Y") if born else ""
+
+
+def ipn_problem(ipn: str):
+    """Текст помилки, якщо 10-значний ІПН не може бути справжнім РНОКПП, інакше None."""
+    if not checksum_ok(ipn):
+        return "❌ ІПН не пройшов перевірку контрольної цифри — схоже на описку."
+    if not birth_date_ok(ipn):
+        return (f"❌ За цим ІПН дата народження {calculate_birthdate(ipn)} "
+                f"(вік поза межами {MIN_AGE}–{MAX_AGE} років) — перевірте номер.")
+    return None
+
+
+def near_match_lines(matches: dict) -> list:
+    return [f"   {ipn} – {entry.pib} – {entry.status}" for ipn, entry in sorted(matches.items())]
+
+
+def split_message(lines, limit: int = MESSAGE_LIMIT) -> list:
+    """Розбиває рядки на повідомлення, що не перевищують ліміт Telegram.
+
+    Telegram рахує довжину в UTF-16, тому емодзі займають два символи.
+    """
+    chunks, current, size = [], [], 0
+    for line in lines:
+        encoded = line.encode("utf-16-le")
+        if len(encoded) // 2 > limit:
+            # обрізається до `limit` одиниць UTF-16 (по 2 байти); якщо остання — перша
+            # половина пари сурогатів, пара не розривається, а відкидається цілком
+            cut = limit * 2
+            if 0xD800 <= int.from_bytes(encoded[cut - 2:cut], "little") <= 0xDBFF:
+                cut -= 2
+            encoded = encoded[:cut]
+            line = encoded.decode("utf-16-le")
+        length = len(encoded) // 2
+        if current and size + length + 1 > limit:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += length + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks or [""]
+
+
+def status_kind(status: str) -> str:
+    s = (status or "").lower()
+    if "не погоджено" in s:
+        return "rejected"
+    if "очікує" in s:
+        return "pending"
+    if "погоджено" in s:
+        return "approved"
+    return "other"
+
+
+def worst_kind(statuses) -> str:
+    return min((status_kind(s) for s in statuses), key=KIND_PRIORITY.index)
+
+
+def direction_lines(entries: dict) -> list:
+    return [f"   {DIRECTION_LABELS.get(title, title)}: {entry.pib} – {entry.status}" for title, entry in entries.items()]
 
 
 def is_cancel(text: str) -> bool:
@@ -85,6 +217,37 @@ def is_cancel(text: str) -> bool:
     return t in ["❌ скасувати", "скасувати"]
 
 
+def build_row(mode: str, pib: str, ipn: str, company: str = "") -> list:
+    """Новий рядок для листа відповідного режиму."""
+    birthdate = calculate_birthdate(ipn)
+    current_date = datetime.today().strftime("%d.%m.%y")
+
+    # *** ГОЛОВНА ЗМІНА ***
+    # Для охорони: A..I = Дата, ПІБ, ДН, ІПН, Статус, Дата перевірки, Перевіряючий, Коментар, Компанія
+    # Для магазинів: A..G = Дата, ПІБ, ДН, ІПН, Статус, Перевіряючий, Коментар
+    if mode == "security":
+        return [
+            current_date,               # A Дата
+            pib,                        # B ПІБ
+            birthdate,                  # C Дата народження
+            ipn,                        # D ІПН
+            "Очікує погодження",        # E Статус
+            "",                         # F Дата перевірки
+            "",                         # G Перевіряючий
+            "",                         # H Коментар
+            company                     # I Компанія (останній стовпець)
+        ]
+    return [
+        current_date,               # A Дата
+        pib,                        # B ПІБ
+        birthdate,                  # C Дата народження
+        ipn,                        # D ІПН
+        "Очікує погодження",        # E Статус
+        "",                         # F Перевіряючий
+        ""                          # G Коментар
+    ]
+
+
 # ====== HANDLERS ======
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
@@ -102,6 +265,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "========================================================"
         "Можна здійснювати перевірку більше одного працівника."
         " Для цього внесіть ІПН декількох працівників через пробіл або в стовпчик."
+        "\n\nЩоб додати багато працівників одразу, надішліть у меню файл *CSV* або *XLSX* "
+        "зі стовпцями ПІБ та ІПН — у відповідь прийде звіт по кожному рядку."
         "\n\nЯкщо у ІПН переплутані цифри, то працівник *перевірятися не буде* та вам у телеграм прийде сповіщення у форматі:"
         "\nПІБ - *Очікує погодження*"
         "\nКоментар: _Невірний ІПН_"
@@ -128,6 +293,8 @@ async def select_direction(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data["requested_mode"] = "retail"
     elif "Охорона" in text:
         context.user_data["requested_mode"] = "security"
+    elif "Перевіряючий" in text:
+        context.user_data["requested_mode"] = "review"
     else:
         await update.message.reply_text("❌ Невірний вибір. Спробуйте ще раз.")
         return SELECT_DIRECTION
@@ -158,6 +325,10 @@ async def check_password(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     elif requested == "retail" and password == RETAIL_PASSWORD:
         context.user_data["mode"] = "retail"
+    elif requested == "review" and REVIEWER_PASSWORD and password == REVIEWER_PASSWORD:
+        context.user_data["mode"] = "review"
+        await update.message.reply_text("✅ Доступ надано: Перевіряючий", reply_markup=review_keyboard)
+        return REVIEWING
     else:
         await update.message.reply_text("❌ Невірний пароль. Спробуйте ще раз:", reply_markup=cancel_keyboard)
         return ASK_PASSWORD
@@ -217,7 +388,6 @@ async def enter_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def enter_ipn(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    sheet = get_sheet(context)
     text = update.message.text.strip()
 
     if is_cancel(text):
@@ -229,86 +399,134 @@ async def enter_ipn(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     ipn = text
 
-    # перевірка на дубль
-    data = sheet.get_all_records(expected_headers=HEADERS)
-    for row in data:
-        if normalize_ipn(row.get("ІПН")) == normalize_ipn(ipn):
-            await update.message.reply_text(
-                "🚫 Працівник вже існує.",
-                reply_markup=get_main_keyboard(context.user_data.get("mode", "retail"))
-            )
-            return CHOOSING
+    # перевірка на дубль — одразу в обох напрямках, одним запитом до таблиці
+    title = sheet_title(context.user_data.get("mode", "retail"))
+    index = index_for(title)
+    cross = cross_index()
+    try:
+        stale = await refresh_or_stale(cross)
+    except SHEETS_ERRORS:
+        await update.message.reply_text(SHEETS_UNAVAILABLE_TEXT)
+        return ENTER_IPN
+    found = cross.lookup(ipn)
+    if title in found or journal.is_pending(title, ipn):
+        await update.message.reply_text(
+            "🚫 Працівник вже існує.",
+            reply_markup=get_main_keyboard(context.user_data.get("mode", "retail"))
+        )
+        return CHOOSING
 
-    birthdate = calculate_birthdate(ipn)
-    current_date = datetime.today().strftime("%d.%m.%y")
+    # описки: контрольна цифра / дата народження та схожі ІПН відомих працівників
+    near = index.near_matches(ipn)
+    problem = ipn_problem(ipn)
+    if problem:
+        lines = [problem]
+        if near:
+            lines += ["", "Можливо, мався на увазі:"] + near_match_lines(near)
+        await update.message.reply_text("\n".join(lines))
+        return ENTER_IPN
 
     mode = context.user_data.get("mode", "retail")
     company = context.user_data.get("company", "") if mode == "security" else ""
-
-    # *** ГОЛОВНА ЗМІНА ***
-    # Для охорони: A..I = Дата, ПІБ, ДН, ІПН, Статус, Дата перевірки, Перевіряючий, Коментар, Компанія
-    # Для магазинів: A..G = Дата, ПІБ, ДН, ІПН, Статус, Перевіряючий, Коментар
-    if mode == "security":
-        new_row = [
-            current_date,               # A Дата
-            context.user_data["pib"],   # B ПІБ
-            birthdate,                  # C Дата народження
-            ipn,                        # D ІПН
-            "Очікує погодження",        # E Статус
-            "",                         # F Дата перевірки
-            "",                         # G Перевіряючий
-            "",                         # H Коментар
-            company                     # I Компанія (останній стовпець)
-        ]
-    else:
-        new_row = [
-            current_date,               # A Дата
-            context.user_data["pib"],   # B ПІБ
-            birthdate,                  # C Дата народження
-            ipn,                        # D ІПН
-            "Очікує погодження",        # E Статус
-            "",                         # F Перевіряючий
-            ""                          # G Коментар
-        ]
-
-    sheet.append_row(new_row)
-
-    await update.message.reply_text("✅ Працівника додано!", reply_markup=get_main_keyboard(mode))
+    new_row = build_row(mode, context.user_data["pib"], ipn, company)
+
+    # рядок фіксується в журналі, а в таблицю дописується пачкою у фоні
+    journal.enqueue(title, ipn, new_row)
+    index.add_local(ipn, context.user_data["pib"], "Очікує погодження")
+    notifier.subscribe(title, ipn, update.effective_chat.id, context.user_data["pib"])
+
+    text = "✅ Працівника додано!"
+    others = {t: entry for t, entry in found.items() if t != title}
+    if others:
+        text += "\n\n⚠️ Цей ІПН уже подавався в іншому напрямку:\n" + "\n".join(direction_lines(others))
+    if near:
+        text += "\n\n⚠️ У таблиці є схожі ІПН — перевірте, чи це не описка:\n" + "\n".join(near_match_lines(near))
+    if stale:
+        # перевірка на дубль могла не побачити найсвіжіших рядків
+        text += "\n\n" + STALE_DATA_TEXT
+    await update.message.reply_text(text, reply_markup=get_main_keyboard(mode))
     return CHOOSING
 
 
 # ====== ПЕРЕВІРКА ======
 async def start_check(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("🔎 Введіть ІПН(и):", reply_markup=cancel_keyboard)
+    context.user_data.pop("check_all", None)
+    await update.message.reply_text("🔎 Введіть ІПН(и):", reply_markup=check_keyboard)
+    return CHECK_STATUS
+
+
+async def check_all_directions(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data["check_all"] = True
+    await update.message.reply_text("🌐 Перевірка по всіх напрямках. Введіть ІПН(и):", reply_markup=cancel_keyboard)
     return CHECK_STATUS
 
 
 async def check_ipn(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    sheet = get_sheet(context)
     text = update.message.text.strip()
 
     if is_cancel(text):
         return await cancel(update, context)
 
-    ipns = text.split()
+    # порядок зберігається, повтори відкидаються
+    ipns = list(dict.fromkeys(text.split()))
     results = []
+    counts = {kind: 0 for kind in STATUS_KINDS}
 
-    rows = sheet.get_all_records()
+    mode = context.user_data.get("mode", "retail")
+    title = sheet_title(mode)
+    index = index_for(title)
+    # режим «усі напрямки»: обидва листи читаються одним запитом, статус — по кожному
+    all_directions = context.user_data.get("check_all", False)
+    source = cross_index() if all_directions else index
+    try:
+        stale = await refresh_or_stale(source)
+    except SHEETS_ERRORS:
+        await update.message.reply_text(SHEETS_UNAVAILABLE_TEXT)
+        return CHECK_STATUS
+    if all_directions:
+        found = source.lookup_many(ipns)
+    else:
+        found = {ipn: {title: entry} if entry else {} for ipn, entry in index.lookup_many(ipns).items()}
     for ipn in ipns:
-        found = False
-        for row in rows:
-            if str(row.get("ІПН", "")).zfill(10) == ipn:
-                results.append(f"{ipn} – {row.get('ПІБ')} – {row.get('Статус')}")
-                found = True
-                break
-        if not found:
+        entries = found[ipn]
+        entry = next(iter(entries.values()), None)
+        if entry is not None:
+            if all_directions:
+                statuses = "; ".join(f"{DIRECTION_LABELS.get(t, t)}: {e.status}" for t, e in entries.items())
+            else:
+                statuses = entry.status
+            results.append(f"{ipn} – {entry.pib} – {statuses}")
+            counts[worst_kind(e.status for e in entries.values())] += 1
+        elif not ipn.isdigit() or len(ipn) > 10 or ipn_problem(normalize_ipn(ipn)):
+            results.append(f"{ipn} – ⚠️ Невірний ІПН")
+            counts["invalid"] += 1
+        else:
             results.append(f"{ipn} – ❌ Не знайдено")
+            counts["not_found"] += 1
+        if entry is None and ipn.isdigit() and len(ipn) <= 10:
+            near = index.near_matches(ipn)
+            if near:
+                results.append("   можливо:")
+                results += near_match_lines(near)
+
+    summary = "\n".join(f"{STATUS_KINDS[kind]}: {n}" for kind, n in counts.items() if n)
+    summary = f"📋 Перевірено ІПН: {len(ipns)}\n{summary}"
+    if stale:
+        summary = f"{STALE_DATA_TEXT}\n\n{summary}"
+
+    if len(ipns) > CHECK_FILE_THRESHOLD:
+        await update.message.reply_document(
+            document="\n".join(results).encode("utf-8"),
+            filename="statuses.txt",
+            caption=summary,
+            reply_markup=get_main_keyboard(mode)
+        )
+        return CHOOSING
 
-    mode = context.user_data.get("mode", "retail")
-    await update.message.reply_text(
-        "\n".join(results),
-        reply_markup=get_main_keyboard(mode)
-    )
+    chunks = split_message([summary, ""] + results)
+    for chunk in chunks[:-1]:
+        await update.message.reply_text(chunk)
+    await update.message.reply_text(chunks[-1], reply_markup=get_main_keyboard(mode))
     return CHOOSING
 
 
@@ -316,6 +534,9 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # при скасуванні: якщо режим вже вибраний — повертаємо в головне меню,
     # інакше назад до вибору напрямку
     mode = context.user_data.get("mode")
+    if mode == "review":
+        await update.message.reply_text("🔙 Скасовано.", reply_markup=review_keyboard)
+        return REVIEWING
     if mode:
         await update.message.reply_text("🔙 Скасовано.", reply_markup=get_main_keyboard(mode))
         return CHOOSING
@@ -324,52 +545,20 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return SELECT_DIRECTION
 
 
-# ====== ЗАПУСК ======
-if __name__ == "__main__":
-    from analytics_menu import analytics_handlers
-
-    app = ApplicationBuilder().token(os.getenv("Telegram_Token")).build()
-
-    conv = ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
-        states={
-            SELECT_DIRECTION: [
-                MessageHandler(filters.Regex("^(❌ Скасувати|Скасувати)$"), cancel),
-                MessageHandler(filters.TEXT & ~filters.COMMAND, select_direction),
-            ],
-            ASK_PASSWORD: [
-                MessageHandler(filters.Regex("^(❌ Скасувати|Скасувати)$"), cancel),
-                MessageHandler(filters.TEXT & ~filters.COMMAND, check_password),
-            ],
-            ASK_COMPANY: [
-                MessageHandler(filters.Regex("^(❌ Скасувати|Скасувати)$"), cancel),
-                MessageHandler(filters.TEXT & ~filters.COMMAND, save_company),
-            ],
-            CHOOSING: [
-                MessageHandler(filters.Regex("^(❌ Скасувати|Скасувати)$"), cancel),
-                MessageHandler(filters.Regex("^➕ Додати працівника$"), start_add),
-                MessageHandler(filters.Regex("^📋 Перевірити статус$"), start_check),
-                MessageHandler(filters.Regex("^⬅️ Змінити напрямок$"), change_direction),
-            ],
-            ENTER_NAME: [
-                MessageHandler(filters.Regex("^(❌ Скасувати|Скасувати)$"), cancel),
-                MessageHandler(filters.TEXT & ~filters.COMMAND, enter_name),
-            ],
-            ENTER_IPN: [
-                MessageHandler(filters.Regex("^(❌ Скасувати|Скасувати)$"), cancel),
-                MessageHandler(filters.TEXT & ~filters.COMMAND, enter_ipn),
-            ],
-            CHECK_STATUS: [
-                MessageHandler(filters.Regex("^(❌ Скасувати|Скасувати)$"), cancel),
-                MessageHandler(filters.TEXT & ~filters.COMMAND, check_ipn),
-            ],
-        },
-        fallbacks=[MessageHandler(filters.Regex("^(❌ Скасувати|Скасувати)$"), cancel)],
-        allow_reentry=True,
-    )
-
-    app.add_handler(conv)
-    for handler in analytics_handlers:
-        app.add_handler(handler)
-
-    app.run_polling()
+# ====== СПОВІЩЕННЯ ======
+async def notify_status_changes(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue: надсилає подавачам результати перевірки — одне повідомлення на чат."""
+    if not notifier.active():
+        return
+    try:
+        messages = await gateway.run(notifier.poll)
+    except Exception:
+        logging.exception("Не вдалося перевірити зміни статусів")
+        return
+    for chat_id, lines in messages.items():
+        try:
+            for chunk in split_message(["🔔 Результати перевірки:", ""] + lines):
+                await context.bot.send_message(chat_id, chunk)
+            notifier.sent += 1
+        except TelegramError as e:
+            logging.warning("Сповіщення в чат %s не надіслано: %s", chat_id, e)
@@ -0,0 +1,186 @@
+import io
+import csv
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from bot import (
+    CHOOSING, STALE_DATA_TEXT, SHEETS_UNAVAILABLE_TEXT, build_row, gateway, get_ipn_index, get_main_keyboard,
+    ipn_problem, is_valid_ipn, journal, notifier, proper_case, refresh_or_stale,
+)
+from ipn_index import normalize_ipn
+from sheets import SHEETS_ERRORS, sheet_title
+
+
+logger = logging.getLogger(__name__)
+
+MAX_FILE_SIZE = 5 * 1024 * 1024
+ACCEPTED = "✅ Прийнято"
+
+
+# ====== ЧИТАННЯ ФАЙЛУ ======
+def _decode(data: bytes) -> io.TextIOWrapper:
+    for encoding in ("utf-8-sig", "cp1251"):
+        try:
+            data[:4096].decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        return io.TextIOWrapper(io.BytesIO(data), encoding=encoding, newline="")
+    return io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="replace", newline="")
+
+
+def iter_csv(data: bytes):
+    stream = _decode(data)
+    sample = stream.read(4096)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    yield from csv.reader(stream, dialect)
+
+
+def iter_xlsx(data: bytes):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Для XLSX потрібен пакет openpyxl — надішліть файл у форматі CSV.")
+
+    book = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        yield from book.active.iter_rows(values_only=True)
+    finally:
+        book.close()
+
+
+def iter_rows(filename: str, data: bytes):
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return iter_csv(data)
+    if name.endswith(".xlsx"):
+        return iter_xlsx(data)
+    raise ValueError("Підтримуються лише файли CSV або XLSX.")
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _ipn(value) -> str:
+    # числові клітинки Excel втрачають нулі на початку
+    if isinstance(value, (int, float)):
+        return normalize_ipn(_text(value))
+    return _text(value)
+
+
+def iter_workers(rows):
+    """(номер рядка, ПІБ, ІПН) з рядків файлу; заголовок ПІБ / ІПН визначається автоматично."""
+    pib_col, ipn_col = 0, 1
+    for number, row in enumerate(rows, start=1):
+        cells = list(row or ())
+        if not any(_text(c) for c in cells):
+            continue
+        lowered = [_text(c).lower() for c in cells]
+        if "піб" in lowered and "іпн" in lowered:
+            pib_col, ipn_col = lowered.index("піб"), lowered.index("іпн")
+            continue
+        pib = cells[pib_col] if pib_col < len(cells) else ""
+        ipn = cells[ipn_col] if ipn_col < len(cells) else ""
+        yield number, _text(pib), _ipn(ipn)
+
+
+# ====== ПЕРЕВІРКА ======
+def check_workers(workers, index, pending: set):
+    """Один прохід: валідація, дублі з таблицею / чергою та всередині файлу."""
+    accepted, report = [], []
+    seen = set()
+    for number, pib, ipn in workers:
+        key = normalize_ipn(ipn) if ipn else ""
+        problem = ipn_problem(ipn) if is_valid_ipn(ipn) else None
+        if not is_valid_ipn(ipn):
+            verdict = "❌ Невірний ІПН"
+        elif problem:
+            verdict = problem
+        elif len(pib.split()) < 2:
+            verdict = "❌ Формат ПІБ: Прізвище Ім’я По-батькові"
+        elif key in seen:
+            verdict = "🔁 Дубль у файлі"
+        elif key in pending or index.lookup(key) is not None:
+            verdict = "🚫 Працівник вже існує"
+        else:
+            pib = proper_case(pib)
+            verdict = ACCEPTED
+            accepted.append((pib, ipn))
+        seen.add(key)
+        report.append((number, pib, ipn, verdict))
+    return accepted, report
+
+
+def render_report(report) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    writer.writerow(["Рядок", "ПІБ", "ІПН", "Результат"])
+    writer.writerows(report)
+    return buffer.getvalue().encode("utf-8-sig")
+
+
+# ====== ОБРОБНИК ======
+async def bulk_upload(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    document = update.message.document
+    mode = context.user_data.get("mode", "retail")
+    keyboard = get_main_keyboard(mode)
+
+    if document.file_size and document.file_size > MAX_FILE_SIZE:
+        await update.message.reply_text("❌ Файл завеликий (максимум 5 МБ).", reply_markup=keyboard)
+        return CHOOSING
+
+    file = await document.get_file()
+    data = bytes(await file.download_as_bytearray())
+
+    index = get_ipn_index(context)
+    title = sheet_title(mode)
+    try:
+        stale = await refresh_or_stale(index)
+    except SHEETS_ERRORS:
+        await update.message.reply_text(SHEETS_UNAVAILABLE_TEXT, reply_markup=keyboard)
+        return CHOOSING
+
+    try:
+        rows = iter_rows(document.file_name, data)
+        accepted, report = await asyncio.to_thread(
+            check_workers, iter_workers(rows), index, journal.pending_ipns(title)
+        )
+    except Exception as e:
+        logger.warning("Не вдалося розібрати файл %s: %s", document.file_name, e)
+        await update.message.reply_text(f"❌ Не вдалося прочитати файл. {e}", reply_markup=keyboard)
+        return CHOOSING
+
+    company = context.user_data.get("company", "") if mode == "security" else ""
+    if accepted:
+        ids = journal.enqueue_many(title, [(ipn, build_row(mode, pib, ipn, company)) for pib, ipn in accepted])
+        for pib, ipn in accepted:
+            index.add_local(ipn, pib, "Очікує погодження")
+        notifier.subscribe_many(title, update.effective_chat.id, [(ipn, pib) for pib, ipn in accepted])
+        try:
+            # саме прийняті рядки (а не найстаріші в черзі) — одним append_rows
+            await gateway.run(journal.flush, title, len(ids), ids=ids, kind="write")
+        except Exception:
+            logger.warning("Пакет лишився в журналі, буде дописаний у фоні")
+
+    rejected = len(report) - len(accepted)
+    caption = f"📥 Оброблено рядків: {len(report)}\n✅ Прийнято: {len(accepted)}\n❌ Відхилено: {rejected}"
+    if stale:
+        caption += f"\n\n{STALE_DATA_TEXT}"
+    await update.message.reply_document(
+        document=render_report(report),
+        filename="report.csv",
+        caption=caption,
+        reply_markup=keyboard,
+    )
+    return CHOOSING
@@ -0,0 +1,80 @@
+from array import array
+from datetime import date, datetime
+
+
+# Дата як порядковий номер дня: 0 — порожня клітинка, -1 — не дата
+EMPTY, INVALID = 0, -1
+
+
+class DateParser:
+    """Розбирає дд.мм.рр / дд.мм.рррр один раз на кожне унікальне значення."""
+
+    def __init__(self):
+        self._cache = {"": EMPTY}
+
+    def __call__(self, text) -> int:
+        text = str(text).strip()
+        ordinal = self._cache.get(text)
+        if ordinal is None:
+            ordinal = INVALID
+            for fmt in ("%d.%m.%y", "%d.%m.%Y"):
+                try:
+                    ordinal = datetime.strptime(text, fmt).toordinal()
+                    break
+                except ValueError:
+                    continue
+            self._cache[text] = ordinal
+        return ordinal
+
+
+def ordinal_iso(ordinal: int):
+    return date.fromordinal(ordinal).isoformat() if ordinal > 0 else None
+
+
+# ====== СТОВПЦІ ЛИСТА ======
+class SheetColumns:
+    """Компактне стовпцеве представлення листа.
+
+    Замість dict на кожен рядок — масиви array: номер рядка, дати як порядкові
+    номери і відбиток (hash) рядка, за яким між синхронізаціями знаходяться лише
+    нові / змінені рядки. Решту полів репліка бере з самого рядка листа.
+    """
+
+    def __init__(self, dates: DateParser = None):
+        self.dates = dates or DateParser()
+        self.row = array("I")
+        self.date = array("i")
+        self.checked = array("i")
+        self.digest = array("q")
+
+    def __len__(self):
+        return len(self.row)
+
+    @classmethod
+    def from_values(cls, values, positions: dict, previous: "SheetColumns" = None) -> "SheetColumns":
+        """values — рядки листа без заголовка; positions — назва поля → індекс стовпця.
+
+        Кеш дат переходить від попереднього знімка.
+        """
+        cols = cls(previous.dates if previous is not None else None)
+
+        def cell(row, name):
+            pos = positions.get(name)
+            return row[pos] if pos is not None and pos < len(row) else ""
+
+        for number, row in enumerate(values, start=2):
+            if not any(row):
+                continue
+            cols.row.append(number)
+            cols.date.append(cols.dates(cell(row, "date")))
+            cols.checked.append(cols.dates(cell(row, "checked")))
+            cols.digest.append(hash(tuple(row)))
+        return cols
+
+    def changed_since(self, previous: "SheetColumns"):
+        """(індекси нових / змінених рядків, номери рядків, яких більше немає)."""
+        if previous is None:
+            return list(range(len(self))), []
+        old = dict(zip(previous.row, previous.digest))
+        changed = [i for i, (number, digest) in enumerate(zip(self.row, self.digest)) if old.pop(number, None) != digest]
+        return changed, list(old)
@@ -0,0 +1,148 @@
+from collections import namedtuple
+
+
+# ====== СТАТУСИ ======
+APPROVED = "✅ Погоджено"
+REJECTED = "❌ Не погоджено"
+PENDING = "Очікує погодження"
+
+Stats = namedtuple("Stats", ["submitted", "checked", "approved", "rejected", "pending"])
+
+# День для агрегатів: ISO-дата, '' — порожня клітинка, '?' — не дата
+_DAY = "COALESCE({p}.{iso}, CASE WHEN COALESCE({p}.{raw}, '') = '' THEN '' ELSE '?' END)"
+
+
+def _trigger_rows(p):
+    """Два лічильники рядка: за датою подання і за датою перевірки."""
+    return [
+        ("submitted", _DAY.format(p=p, iso="date_iso", raw="date")),
+        ("checked", _DAY.format(p=p, iso="checked_iso", raw="checked")),
+    ]
+
+
+def _apply(p, delta):
+    return "\n".join(
+        f"""    INSERT INTO daily_stats (sheet, day, kind, company, status, n)
+    VALUES ({p}.sheet, {day}, '{kind}', COALESCE({p}.company, ''), COALESCE({p}.status, ''), {delta})
+    ON CONFLICT (sheet, day, kind, company, status) DO UPDATE SET n = n + ({delta});"""
+        for kind, day in _trigger_rows(p)
+    )
+
+
+# Агрегати оновлюються тригерами на кожну вставку / зміну / видалення рядка репліки
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS daily_stats (
+    sheet TEXT NOT NULL,
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    company TEXT NOT NULL,
+    status TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (sheet, kind, day, company, status)
+);
+CREATE TRIGGER IF NOT EXISTS rows_stats_insert AFTER INSERT ON rows BEGIN
+{_apply("NEW", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS rows_stats_delete AFTER DELETE ON rows BEGIN
+{_apply("OLD", -1)}
+END;
+CREATE TRIGGER IF NOT EXISTS rows_stats_update AFTER UPDATE ON rows BEGIN
+{_apply("OLD", -1)}
+{_apply("NEW", 1)}
+END;
+"""
+
+REBUILD = f"""
+DELETE FROM daily_stats;
+INSERT INTO daily_stats (sheet, day, kind, company, status, n)
+    SELECT sheet, {_DAY.format(p="rows", iso="date_iso", raw="date")}, 'submitted',
+           COALESCE(company, ''), COALESCE(status, ''), COUNT(*)
+    FROM rows GROUP BY 1, 2, 4, 5;
+INSERT INTO daily_stats (sheet, day, kind, company, status, n)
+    SELECT sheet, {_DAY.format(p="rows", iso="checked_iso", raw="checked")}, 'checked',
+           COALESCE(company, ''), COALESCE(status, ''), COUNT(*)
+    FROM rows GROUP BY 1, 2, 4, 5;
+"""
+
+
+def ensure(conn):
+    """Перебудовує агрегати, якщо репліка вже є, а лічильників ще немає."""
+    empty = conn.execute(
+        "SELECT NOT EXISTS (SELECT 1 FROM daily_stats) AND EXISTS (SELECT 1 FROM rows)"
+    ).fetchone()[0]
+    if empty:
+        conn.executescript(REBUILD)
+
+
+# ====== ЗАПИТИ ======
+def _by_status(replica, where: str, args) -> dict:
+    rows = replica.query(
+        f"SELECT status, SUM(n) FROM daily_stats WHERE {where} GROUP BY status HAVING SUM(n) > 0", args
+    )
+    return dict(rows)
+
+
+def summarize(by_status: dict) -> Stats:
+    submitted = checked = approved = rejected = 0
+    for status, n in by_status.items():
+        s = status.lower()
+        submitted += n
+        if s != PENDING.lower():
+            checked += n
+            if "не погоджено" in s:
+                rejected += n
+            elif "погоджено" in s:
+                approved += n
+    return Stats(submitted, checked, approved, rejected, by_status.get(PENDING, 0))
+
+
+def period_stats(replica, sheet: str, start, end) -> Stats:
+    """Подані за період [start, end] (дата подання) з розбивкою за статусом."""
+    return summarize(_by_status(
+        replica, "sheet = ? AND kind = 'submitted' AND day BETWEEN ? AND ?",
+        (sheet, start.isoformat(), end.isoformat()),
+    ))
+
+
+def company_stats(replica, sheet: str, start, end) -> dict:
+    """Компанія → {статус: кількість} поданих за період [start, end]."""
+    rows = replica.query(
+        "SELECT company, status, SUM(n) FROM daily_stats "
+        "WHERE sheet = ? AND kind = 'submitted' AND day BETWEEN ? AND ? "
+        "GROUP BY company, status HAVING SUM(n) > 0",
+        (sheet, start.isoformat(), end.isoformat()),
+    )
+    result = {}
+    for company, status, n in rows:
+        result.setdefault(company, {})[status] = n
+    return result
+
+
+def day_stats(replica, sheet: str, day) -> Stats:
+    """Подано за дату подання; перевірено / погоджено / не погоджено — за датою перевірки."""
+    iso = day.isoformat()
+    submitted = sum(_by_status(replica, "sheet = ? AND kind = 'submitted' AND day = ?", (sheet, iso)).values())
+    checked = _by_status(replica, "sheet = ? AND kind = 'checked' AND day = ?", (sheet, iso))
+    return Stats(
+        submitted,
+        sum(checked.values()),
+        checked.get(APPROVED, 0),
+        checked.get(REJECTED, 0),
+        0,
+    )
+
+
+def pending_count(replica, sheet: str) -> int:
+    return _by_status(replica, "sheet = ? AND kind = 'submitted' AND status = ?", (sheet, PENDING)).get(PENDING, 0)
+
+
+def overall_stats(replica, sheet: str) -> Stats:
+    submitted = _by_status(replica, "sheet = ? AND kind = 'submitted'", (sheet,))
+    checked = _by_status(replica, "sheet = ? AND kind = 'checked' AND day != ''", (sheet,))
+    return Stats(
+        sum(submitted.values()),
+        sum(checked.values()),
+        submitted.get(APPROVED, 0),
+        submitted.get(REJECTED, 0),
+        submitted.get(PENDING, 0),
+    )
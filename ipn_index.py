@@ -0,0 +1,326 @@
+import os
+import time
+import logging
+import threading
+from collections import namedtuple
+from contextlib import ExitStack
+
+from rnokpp import variants
+from sheets import FIRST_DATA_ROW
+
+
+logger = logging.getLogger(__name__)
+
+# ====== НАЛАШТУВАННЯ ======
+# як часто (сек) дозволено підтягувати хвіст таблиці
+INDEX_TTL = int(os.getenv("Ipn_Index_Ttl", "15"))
+# повна перебудова — на випадок ручного сортування / видалення рядків
+INDEX_REBUILD_INTERVAL = int(os.getenv("Ipn_Index_Rebuild", "3600"))
+
+# стовпці, які читає індекс (позиції беруться із заголовка листа)
+INDEX_COLUMNS = ("ПІБ", "ІПН", "Статус")
+STATUS_COLUMNS = ("Статус",)
+
+IpnEntry = namedtuple("IpnEntry", ["row", "pib", "status"])
+
+
+def normalize_ipn(ipn: str) -> str:
+    return str(ipn).strip().zfill(10)
+
+
+# ====== ІНДЕКС ======
+class IpnIndex:
+    """Індекс ІПН → (номер рядка, ПІБ, Статус) для одного листа.
+
+    Читаються лише стовпці ПІБ / ІПН / Статус. Після першого завантаження індекс
+    оновлюється інкрементально: одним batch_get читаються лише нові рядки після
+    останнього відомого та стовпець «Статус».
+    """
+
+    def __init__(self, pool, title: str, archive=None, ttl: int = INDEX_TTL, rebuild_interval: int = INDEX_REBUILD_INTERVAL):
+        self.pool = pool
+        self.title = title
+        # архівні листи: ІПН → розділ шукається в локальному індексі архіватора
+        self.archive = archive
+        self.ttl = ttl
+        self.rebuild_interval = rebuild_interval
+        self._entries = {}
+        self._row_ipn = []          # row_ipn[i] — ІПН рядка FIRST_DATA_ROW + i
+        self._local = {}            # додані ботом, але ще не прочитані з таблиці
+        # _lock — лише дані (його беруть пошуки з потоку event loop, тож без мережі під ним);
+        # _refresh_lock — по одному оновленню за раз, на весь час читання таблиці
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # зростає з кожним invalidate — прочитане до нього вже не застосовується
+        self._epoch = 0
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+        self._stale = False
+        # індекс відновлено зі знімка — перший refresh звіряє останній рядок
+        self._verify = False
+        # зростає з кожною зміною — знімок пишеться лише для змінених індексів
+        self.generation = 0
+
+    @property
+    def last_row(self) -> int:
+        return FIRST_DATA_ROW - 1 + len(self._row_ipn)
+
+    @property
+    def ready(self) -> bool:
+        """Індекс уже читався з таблиці (або знімка) — ним можна відповідати, навіть застарілим."""
+        return bool(self._row_ipn)
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --- оновлення ---
+    def refresh(self, force: bool = False):
+        with self._refresh_lock:
+            self._refresh_locked(force)
+
+    def _refresh_locked(self, force: bool = False):
+        """План і застосування — під _lock, читання таблиці — без нього.
+        Викликати з узятим _refresh_lock."""
+        while True:
+            with self._lock:
+                plan, epoch = self._plan(force), self._epoch
+            if plan is None:
+                return
+            results = self.pool.read_many(self.title, plan)
+            with self._lock:
+                if self._epoch == epoch and self._apply(plan, results):
+                    return
+
+    def invalidate(self):
+        """Номери рядків змінились (рядки перенесено в архів) — наступний refresh перебудує індекс."""
+        with self._lock:
+            self._stale = True
+            self._refreshed_at = 0.0
+            self._epoch += 1
+
+    def _plan(self, force: bool = False):
+        """Проєкції (names, start, end), які треба прочитати; None — індекс ще свіжий."""
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.ttl:
+            return None
+        if self._stale or not self._row_ipn or now - self._rebuilt_at >= self.rebuild_interval:
+            return [(INDEX_COLUMNS, FIRST_DATA_ROW, None)]
+        plan = [
+            (INDEX_COLUMNS, self.last_row + 1, None),
+            (STATUS_COLUMNS, FIRST_DATA_ROW, self.last_row),
+        ]
+        if self._verify:
+            plan.append((("ІПН",), self.last_row, self.last_row))
+        return plan
+
+    def _apply(self, plan, results) -> bool:
+        """Відповіді на _plan(): один діапазон — повна перебудова, два — хвіст і статуси,
+        три — те саме плюс ІПН останнього рядка для звірки знімка.
+
+        False — застосувати не можна, індекс позначено до перебудови (треба новий план)."""
+        if len(plan) == 1:
+            self._rebuild(results[0])
+        elif len(plan) == 3 and not self._last_matches(results[2]):
+            # поки бот не працював, рядки видалили / пересортували — знімок непридатний
+            logger.info("Знімок індексу ІПН '%s' застарів", self.title)
+            self._verify = False
+            self._stale = True
+            self._refreshed_at = 0.0
+            return False
+        else:
+            self._refresh_tail(results[0], results[1])
+        self._verify = False
+        self._refreshed_at = time.monotonic()
+        return True
+
+    def _last_matches(self, rows) -> bool:
+        raw = rows[0][0] if rows else ""
+        return (normalize_ipn(raw) if str(raw).strip() else "") == self._row_ipn[-1]
+
+    def _rebuild(self, rows):
+        self._entries = {}
+        self._row_ipn = []
+        self._add_rows(rows)
+        self._rebuilt_at = time.monotonic()
+        self._stale = False
+        self.generation += 1
+        logger.info("Індекс ІПН '%s' перебудовано: %d рядків", self.title, len(self._row_ipn))
+
+    def _refresh_tail(self, tail, statuses):
+        changed = bool(tail)
+        for i, ipn in enumerate(self._row_ipn):
+            entry = self._entries.get(ipn)
+            if entry is not None and entry.row == FIRST_DATA_ROW + i:
+                status = statuses[i][0] if i < len(statuses) else ""
+                if status != entry.status:
+                    self._entries[ipn] = entry._replace(status=status)
+                    changed = True
+        self._add_rows(tail)
+        if changed:
+            self.generation += 1
+
+    def _add_rows(self, rows):
+        for pib, raw, status in rows:
+            number = FIRST_DATA_ROW + len(self._row_ipn)
+            ipn = normalize_ipn(raw) if str(raw).strip() else ""
+            self._row_ipn.append(ipn)
+            if ipn and ipn not in self._entries:
+                self._entries[ipn] = IpnEntry(number, pib, status)
+            self._local.pop(ipn, None)
+
+    # --- знімок ---
+    def dump(self):
+        """(ПІБ, ІПН, Статус) кожного рядка по порядку; None — зберігати нічого."""
+        with self._lock:
+            if self._stale or not self._row_ipn:
+                return None
+            rows = []
+            for i, ipn in enumerate(self._row_ipn):
+                entry = self._entries.get(ipn)
+                if entry is not None and entry.row == FIRST_DATA_ROW + i:
+                    rows.append((entry.pib, ipn, entry.status))
+                else:
+                    rows.append(("", ipn, ""))
+            return rows
+
+    def restore(self, rows) -> bool:
+        """Індекс зі знімка: пошук працює одразу, а перший refresh дочитує лише хвіст і статуси."""
+        with self._lock:
+            if self._row_ipn:
+                return False
+            self._add_rows(rows)
+            self._rebuilt_at = time.monotonic()
+            self._verify = True
+            self.generation += 1
+        logger.info("Індекс ІПН '%s' відновлено зі знімка: %d рядків", self.title, len(self._row_ipn))
+        return True
+
+    # --- пошук ---
+    def lookup(self, ipn: str):
+        return self.lookup_many([ipn])[ipn]
+
+    def lookup_many(self, ipns) -> dict:
+        with self._lock:
+            result = {}
+            for ipn in ipns:
+                key = normalize_ipn(ipn)
+                result[ipn] = self._entries.get(key) or self._local.get(key)
+        missing = [ipn for ipn, entry in result.items() if entry is None]
+        if missing and self.archive is not None:
+            archived = self.archive.lookup_many(self.title, [normalize_ipn(ipn) for ipn in missing])
+            for ipn in missing:
+                result[ipn] = archived.get(normalize_ipn(ipn))
+        return result
+
+    def in_sheet(self, ipn: str) -> bool:
+        """ІПН прочитано з самої таблиці, а не лише запам'ятовано через add_local."""
+        with self._lock:
+            return normalize_ipn(ipn) in self._entries
+
+    def near_matches(self, ipn: str) -> dict:
+        """Відомі ІПН на відстані однієї описки (заміна цифри / перестановка сусідніх).
+
+        99 варіантів перевіряються в тому ж хеш-індексі (і в архіві) — без перебору листа.
+        """
+        candidates = variants(normalize_ipn(ipn))
+        with self._lock:
+            result = {
+                key: self._entries.get(key) or self._local.get(key)
+                for key in candidates if key in self._entries or key in self._local
+            }
+        if self.archive is not None:
+            for key, entry in self.archive.lookup_many(self.title, candidates - result.keys()).items():
+                result[key] = entry
+        return result
+
+    def add_local(self, ipn: str, pib: str, status: str):
+        """Запам'ятовує щойно записаний рядок, поки його не видно в таблиці."""
+        with self._lock:
+            key = normalize_ipn(ipn)
+            if key not in self._entries:
+                self._local[key] = IpnEntry(None, pib, status)
+
+
+# ====== УСІ НАПРЯМКИ ======
+class CrossIndex:
+    """Спільний погляд на індекси кількох листів: ІПН → {лист: IpnEntry}.
+
+    Окремої копії даних немає — це ті самі IpnIndex, але оновлюються вони разом:
+    проєкції всіх листів, яким пора оновитись, читаються одним values_batch_get.
+    """
+
+    def __init__(self, pool, indexes):
+        self.pool = pool
+        # замки беруться завжди в одному порядку — без взаємного блокування
+        self.indexes = sorted(indexes, key=lambda index: index.title)
+
+    @property
+    def titles(self) -> list:
+        return [index.title for index in self.indexes]
+
+    @property
+    def ready(self) -> bool:
+        return all(index.ready for index in self.indexes)
+
+    def refresh(self, force: bool = False):
+        with ExitStack() as stack:
+            for index in self.indexes:
+                stack.enter_context(index._refresh_lock)
+            plans = []
+            for index in self.indexes:
+                with index._lock:
+                    plan, epoch = index._plan(force), index._epoch
+                if plan is not None:
+                    plans.append((index, plan, epoch))
+            if not plans:
+                return
+            # читання — без замків даних: пошуки в інших чатах не чекають на таблицю
+            results = self.pool.read_across([
+                (index.title, names, start, end) for index, plan, _ in plans for names, start, end in plan
+            ])
+            for index, plan, epoch in plans:
+                with index._lock:
+                    applied = index._epoch == epoch and index._apply(plan, results[:len(plan)])
+                results = results[len(plan):]
+                if not applied:
+                    # лист перебудовується окремим читанням
+                    index._refresh_locked(force)
+
+    def lookup_many(self, ipns) -> dict:
+        """ІПН → {лист: IpnEntry} лише з тими листами, де ІПН є (разом з архівами)."""
+        result = {ipn: {} for ipn in ipns}
+        for index in self.indexes:
+            for ipn, entry in index.lookup_many(ipns).items():
+                if entry is not None:
+                    result[ipn][index.title] = entry
+        return result
+
+    def lookup(self, ipn: str) -> dict:
+        return self.lookup_many([ipn])[ipn]
+
+
+# ====== РЕЄСТР ======
+_indexes = {}
+_registry_lock = threading.Lock()
+
+
+def get_index(pool, title: str, archive=None) -> IpnIndex:
+    """Один індекс на лист (листи беруться з SheetsPool)."""
+    with _registry_lock:
+        index = _indexes.get(title)
+        if index is None:
+            index = _indexes[title] = IpnIndex(pool, title, archive)
+        return index
+
+
+def invalidate(title: str):
+    """Рядки листа зсунулись — його індекс (якщо вже є) буде перебудовано."""
+    with _registry_lock:
+        index = _indexes.get(title)
+    if index is not None:
+        index.invalidate()
+
+
+def get_cross_index(pool, titles, archive=None) -> CrossIndex:
+    """Індекси листів `titles` (з реєстру), що оновлюються разом."""
+    return CrossIndex(pool, [get_index(pool, title, archive) for title in titles])
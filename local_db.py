@@ -0,0 +1,44 @@
+import sqlite3
+import threading
+
+
+class LocalDb:
+    """Локальний SQLite-файл, що відкривається лише при першому зверненні.
+
+    Імпорт модулів бота не створює файлів і не торкається диска.
+    """
+
+    def __init__(self, path: str, schema: str, on_open=None):
+        self.path = path
+        self.schema = schema
+        self.on_open = on_open
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                    conn.executescript(self.schema)
+                    if self.on_open is not None:
+                        self.on_open(conn)
+                    self._conn = conn
+        return self._conn
+
+    def execute(self, sql, args=()):
+        return self.conn.execute(sql, args)
+
+    def executemany(self, sql, args):
+        return self.conn.executemany(sql, args)
+
+    def executescript(self, script):
+        return self.conn.executescript(script)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
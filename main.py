@@ -0,0 +1,189 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+
+# Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("startup")
+
+
+@contextmanager
+def phase(name: str):
+    """Логує тривалість етапу запуску."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        logger.info("%s: %.0f мс", name, (time.monotonic() - started) * 1000)
+
+
+with phase("імпорт модулів"):
+    from telegram.ext import (
+        ApplicationBuilder, CallbackQueryHandler, CommandHandler, ConversationHandler, MessageHandler, filters,
+    )
+
+    import metrics
+    import serving
+    from persistence import SqlitePersistence
+    from bot import (
+        ASK_COMPANY, ASK_PASSWORD, CHECK_STATUS, CHOOSING, ENTER_IPN, ENTER_NAME, REVIEWING, SELECT_DIRECTION,
+        archive, cancel, change_direction, check_all_directions, check_ipn, check_password, enter_ipn, enter_name,
+        gateway, index_for, journal, notify_status_changes, replica, reviews, save_company, select_direction, sheets,
+        snapshot, start, start_add, start_check,
+    )
+    from analytics_menu import ANALYTICS_STATE_NAMES, analytics_handlers
+    from bulk_upload import bulk_upload
+    from review_menu import CALLBACK_PATTERN as REVIEW_CALLBACK_PATTERN, review_callback, show_review_queue
+    from notifications import NOTIFY_INTERVAL
+    from sheets import SHEETS_ERRORS
+
+
+# скільки апдейтів обробляється одночасно
+CONCURRENT_UPDATES = int(os.getenv("Concurrent_Updates", "16"))
+# власний Bot API сервер (telegram-bot-api) замість api.telegram.org
+TELEGRAM_API_URL = os.getenv("Telegram_Api_Url", "https://api.telegram.org/bot")
+
+
+# назви станів для міток метрик
+STATE_NAMES = {
+    SELECT_DIRECTION: "select_direction",
+    ASK_PASSWORD: "ask_password",
+    ASK_COMPANY: "ask_company",
+    CHOOSING: "choosing",
+    ENTER_NAME: "enter_name",
+    ENTER_IPN: "enter_ipn",
+    CHECK_STATUS: "check_status",
+    REVIEWING: "reviewing",
+}
+
+
+# ====== ДІАЛОГ ======
+def cancel_handler():
+    # окремий об'єкт на кожен стан — щоб метрики мали правильну мітку стану
+    return MessageHandler(filters.Regex("^(❌ Скасувати|Скасувати)$"), cancel)
+
+
+def build_conversation() -> ConversationHandler:
+    return ConversationHandler(
+        entry_points=[CommandHandler("start", start)],
+        states={
+            SELECT_DIRECTION: [
+                cancel_handler(),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, select_direction),
+            ],
+            ASK_PASSWORD: [
+                cancel_handler(),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, check_password),
+            ],
+            ASK_COMPANY: [
+                cancel_handler(),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, save_company),
+            ],
+            CHOOSING: [
+                cancel_handler(),
+                MessageHandler(filters.Regex("^➕ Додати працівника$"), start_add),
+                MessageHandler(filters.Regex("^📋 Перевірити статус$"), start_check),
+                MessageHandler(filters.Regex("^⬅️ Змінити напрямок$"), change_direction),
+                MessageHandler(filters.Document.ALL, bulk_upload),
+            ],
+            ENTER_NAME: [
+                cancel_handler(),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, enter_name),
+            ],
+            ENTER_IPN: [
+                cancel_handler(),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, enter_ipn),
+            ],
+            CHECK_STATUS: [
+                cancel_handler(),
+                MessageHandler(filters.Regex("^🌐 Усі напрямки$"), check_all_directions),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, check_ipn),
+            ],
+            REVIEWING: [
+                cancel_handler(),
+                MessageHandler(filters.Regex("^📝 На перевірці$"), show_review_queue),
+                MessageHandler(filters.Regex("^⬅️ Змінити напрямок$"), change_direction),
+            ],
+        },
+        fallbacks=[cancel_handler()],
+        allow_reentry=True,
+        # стан діалогу переживає перезапуск — користувач продовжує з того ж кроку
+        name="main",
+        persistent=True,
+    )
+
+
+# ====== ЗАПУСК ======
+async def post_init(app):
+    # авторизація й відкриття таблиці — у фоні, бот уже приймає апдейти
+    sheets.start_warm_up()
+    with phase("відновлення кешу"):
+        await asyncio.to_thread(snapshot.restore)
+    with phase("відновлення журналу"):
+        try:
+            await gateway.run(journal.recover, index_for)
+        except SHEETS_ERRORS:
+            # рядки «в дорозі» звірить фонове завдання журналу
+            logger.warning("Журнал: таблиця недоступна, звірку відкладено")
+    # незаписані рядки одразу видно в перевірці статусу
+    for title, ipn, row in journal.pending():
+        index_for(title).add_local(ipn, row[1], row[4])
+    journal.start(gateway)
+    replica.start(gateway)
+    archive.start(gateway)
+    reviews.start(gateway)
+    snapshot.start()
+
+
+async def post_shutdown(app):
+    await snapshot.stop()
+    await reviews.stop(gateway)
+    archive.stop()
+    replica.stop()
+    await journal.stop(gateway)
+
+
+def build_application(base_url: str = TELEGRAM_API_URL, persistence=None):
+    persistence = persistence or SqlitePersistence()
+    app = (
+        ApplicationBuilder()
+        .token(os.getenv("Telegram_Token"))
+        .base_url(base_url)
+        .application_class(serving.ChatOrderedApplication)
+        .request(serving.MeteredRequest(connection_pool_size=256))
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .persistence(persistence)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    app.add_handler(metrics.instrument(build_conversation(), STATE_NAMES))
+    for handler in analytics_handlers:
+        app.add_handler(metrics.instrument(handler, ANALYTICS_STATE_NAMES))
+    # кнопки сторінок перевірки живуть довше за стан діалогу — окремий обробник
+    app.add_handler(CallbackQueryHandler(metrics.timed(review_callback, "review"), pattern=REVIEW_CALLBACK_PATTERN))
+    app.job_queue.run_repeating(notify_status_changes, interval=NOTIFY_INTERVAL, first=NOTIFY_INTERVAL)
+    app.job_queue.run_repeating(metrics.log_summary, interval=metrics.METRICS_LOG_INTERVAL, first=metrics.METRICS_LOG_INTERVAL)
+
+    metrics.registry.gauges("sheets_gateway", gateway.stats)
+    metrics.registry.gauges("sheets_pool", sheets.stats)
+    metrics.registry.gauges("journal", lambda: {"depth": journal.depth()})
+    metrics.registry.gauges("review", reviews.stats)
+    metrics.registry.gauges("persistence", persistence.stats)
+    metrics.registry.gauges("snapshot", snapshot.stats)
+    metrics.registry.gauges("archive", lambda: {"moved": archive.moved, "indexed": archive.depth()})
+    return app
+
+
+def main():
+    with phase("побудова застосунку"):
+        app = build_application()
+    sheets.start_background_refresh()
+    metrics.start_server()
+    serving.run(app)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import os
+import time
+import bisect
+import logging
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+logger = logging.getLogger(__name__)
+
+# ====== НАЛАШТУВАННЯ ======
+# локальний endpoint у форматі Prometheus; 0 — вимкнено
+METRICS_PORT = int(os.getenv("Metrics_Port", "9108"))
+METRICS_LISTEN = os.getenv("Metrics_Listen", "127.0.0.1")
+# як часто (сек) писати в лог підсумковий рядок
+METRICS_LOG_INTERVAL = float(os.getenv("Metrics_Log_Interval", "600"))
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+# ====== РЕЄСТР ======
+class Histogram:
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Верхня межа кошика, у який потрапляє квантиль q."""
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.max
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels)
+    return "{%s}" % pairs
+
+
+class Metrics:
+    """Лічильники й гістограми з мітками; пишуться з event loop і з потоків gateway."""
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets=SECONDS_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def gauges(self, prefix: str, source, label: str = "kind"):
+        """source() → dict чисел (або {значення мітки: число}), читається під час експорту."""
+        self._gauges[prefix] = (source, label)
+
+    # --- експорт ---
+    def render(self) -> str:
+        """Текстовий формат Prometheus."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.counts), h.count, h.sum, h.buckets) for key, h in histograms]
+
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(labels)} {value:g}")
+
+        for (name, labels), counts, count, total, buckets in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total:g}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        for prefix, (source, label_name) in sorted(self._gauges.items()):
+            try:
+                values = source()
+            except Exception:
+                logger.exception("Метрики %s недоступні", prefix)
+                continue
+            for key, value in sorted(values.items()):
+                name = f"{prefix}_{key}"
+                if isinstance(value, dict):
+                    lines.append(f"# TYPE {name} gauge")
+                    for label, v in sorted(value.items()):
+                        lines.append(f"{name}{_labels(((label_name, label),))} {v:g}")
+                elif isinstance(value, (int, float)):
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, name: str, limit: int = 5) -> str:
+        """Найповільніші за сумарним часом серії гістограми `name` одним рядком."""
+        with self._lock:
+            series = [(labels, h) for (n, labels), h in self._histograms.items() if n == name]
+            series = [(labels, h.count, h.sum, h.quantile(0.5), h.quantile(0.95), h.max) for labels, h in series]
+        series.sort(key=lambda s: s[2], reverse=True)
+        parts = []
+        for labels, count, total, p50, p95, peak in series[:limit]:
+            label = "/".join(str(v) for _, v in labels)
+            parts.append(f"{label} n={count} avg={total / count * 1000:.0f}мс p50≤{p50 * 1000:g} p95≤{p95 * 1000:g} max={peak * 1000:.0f}")
+        return "; ".join(parts) or "—"
+
+    def total(self, name: str) -> float:
+        with self._lock:
+            return sum(v for (n, _), v in self._counters.items() if n == name)
+
+    def count(self, name: str) -> int:
+        with self._lock:
+            return sum(h.count for (n, _), h in self._histograms.items() if n == name)
+
+
+registry = Metrics()
+
+
+# ====== ОБРОБНИКИ TELEGRAM ======
+def timed(callback, state: str):
+    """Обгортка callback-а: час виконання та помилки з мітками handler / state."""
+    if getattr(callback, "__metered__", False):
+        return callback
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            registry.inc("bot_handler_errors_total", handler=name, state=state)
+            raise
+        finally:
+            registry.observe("bot_handler_seconds", time.perf_counter() - started, handler=name, state=state)
+
+    wrapper.__metered__ = True
+    return wrapper
+
+
+def instrument(conversation, state_names: dict):
+    """Обгортає всі callback-и ConversationHandler; state_names — стан → назва для мітки."""
+    groups = [("entry", conversation.entry_points), ("fallback", conversation.fallbacks)]
+    groups += [(state_names.get(state, str(state)), handlers) for state, handlers in conversation.states.items()]
+    for state, handlers in groups:
+        for handler in handlers:
+            if hasattr(handler, "callback"):
+                handler.callback = timed(handler.callback, state)
+    return conversation
+
+
+# ====== ЕКСПОРТ ======
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port: int = METRICS_PORT, listen: str = METRICS_LISTEN):
+    """http://listen:port/metrics у фоновому потоці."""
+    if not port:
+        return None
+    server = ThreadingHTTPServer((listen, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Метрики: http://%s:%d/metrics", listen, port)
+    return server
+
+
+async def log_summary(context):
+    """Періодичний підсумок у лог (job_queue)."""
+    logger.info(
+        "Обробники: %s | Sheets API: %s (викликів %d, помилок %d) | Telegram API: %s",
+        registry.summary("bot_handler_seconds"),
+        registry.summary("sheets_api_seconds", limit=3),
+        registry.count("sheets_api_seconds"),
+        int(registry.total("sheets_api_errors_total")),
+        registry.summary("telegram_api_seconds", limit=3),
+    )
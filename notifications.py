@@ -0,0 +1,121 @@
+import os
+import time
+import logging
+import threading
+from collections import defaultdict
+
+from ipn_index import normalize_ipn
+from local_db import LocalDb
+
+
+logger = logging.getLogger(__name__)
+
+# ====== НАЛАШТУВАННЯ ======
+NOTIFY_PATH = os.getenv("Notify_Path", "notifications.sqlite3")
+NOTIFY_INTERVAL = float(os.getenv("Notify_Interval", "300"))
+
+# єдині стовпці, які читає перевірка
+SNAPSHOT_COLUMNS = ("ІПН", "Статус", "Коментар")
+
+PENDING = "Очікує погодження"
+INVALID_IPN = "невірний іпн"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    sheet TEXT NOT NULL,
+    ipn TEXT NOT NULL,
+    chat_id INTEGER NOT NULL,
+    pib TEXT,
+    status TEXT NOT NULL DEFAULT '',
+    comment TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    PRIMARY KEY (sheet, ipn, chat_id)
+);
+"""
+
+
+def is_final(status: str, comment: str) -> bool:
+    """Погоджено / не погоджено або позначено «Невірний ІПН» — далі стежити не треба."""
+    return (status and status != PENDING) or INVALID_IPN in comment.lower()
+
+
+class StatusNotifier:
+    """Запам'ятовує, хто подав працівника, і повідомляє про зміну статусу.
+
+    Опитування читає лише стовпці ІПН / Статус / Коментар листів, по яких є
+    підписки, порівнює з попереднім знімком і групує зміни за chat_id.
+    """
+
+    def __init__(self, pool, path: str = NOTIFY_PATH):
+        self.pool = pool
+        self._db = LocalDb(path, SCHEMA)
+        self._lock = threading.Lock()
+        self.sent = 0
+
+    def subscribe(self, sheet: str, ipn: str, chat_id: int, pib: str = ""):
+        self.subscribe_many(sheet, chat_id, [(ipn, pib)])
+
+    def subscribe_many(self, sheet: str, chat_id: int, items):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO subscriptions (sheet, ipn, chat_id, pib, status, comment, created) "
+                "VALUES (?, ?, ?, ?, ?, '', ?)",
+                [(sheet, normalize_ipn(ipn), chat_id, pib, PENDING, now) for ipn, pib in items],
+            )
+
+    def active(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM subscriptions").fetchone()[0]
+
+    def poll(self) -> dict:
+        """Повертає {chat_id: [рядки повідомлення]}. Блокуючий — через gateway."""
+        with self._lock:
+            subs = self._db.execute(
+                "SELECT sheet, ipn, chat_id, pib, status, comment FROM subscriptions"
+            ).fetchall()
+        by_sheet = defaultdict(list)
+        for sub in subs:
+            by_sheet[sub[0]].append(sub)
+
+        messages = defaultdict(list)
+        updates, finished = [], []
+        for sheet, sheet_subs in by_sheet.items():
+            current = self._snapshot(sheet)
+            for _, ipn, chat_id, pib, old_status, old_comment in sheet_subs:
+                if ipn not in current:
+                    continue
+                status, comment = current[ipn]
+                if (status, comment) == (old_status, old_comment):
+                    continue
+                key = (sheet, ipn, chat_id)
+                if is_final(status, comment):
+                    line = f"{pib or ipn} ({ipn}) – {status}"
+                    if comment:
+                        line += f"\nКоментар: {comment}"
+                    messages[chat_id].append(line)
+                    finished.append(key)
+                else:
+                    updates.append((status, comment, *key))
+
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE subscriptions SET status = ?, comment = ? WHERE sheet = ? AND ipn = ? AND chat_id = ?",
+                updates,
+            )
+            self._db.executemany(
+                "DELETE FROM subscriptions WHERE sheet = ? AND ipn = ? AND chat_id = ?", finished
+            )
+            self._db.execute("COMMIT")
+        return dict(messages)
+
+    def _snapshot(self, sheet: str) -> dict:
+        current = {}
+        for raw, status, comment in self.pool.read_columns(sheet, SNAPSHOT_COLUMNS):
+            if not str(raw).strip():
+                continue
+            ipn = normalize_ipn(raw)
+            if ipn not in current:
+                current[ipn] = (status, comment)
+        return current
@@ -0,0 +1,166 @@
+import os
+import json
+import pickle
+import asyncio
+import logging
+import threading
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from local_db import LocalDb
+
+
+logger = logging.getLogger(__name__)
+
+# ====== НАЛАШТУВАННЯ ======
+PERSISTENCE_PATH = os.getenv("Persistence_Path", "persistence.sqlite3")
+# як часто (сек) Application передає змінені дані користувачів / стани діалогів
+PERSISTENCE_INTERVAL = float(os.getenv("Persistence_Interval", "30"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS data (
+    kind TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    state BLOB NOT NULL,
+    PRIMARY KEY (name, key)
+);
+"""
+
+USER, CHAT, BOT = "user", "chat", "bot"
+
+
+# ====== ПЕРСИСТЕНТНІСТЬ ======
+class SqlitePersistence(BasePersistence):
+    """user_data і стани ConversationHandler в одному SQLite-файлі.
+
+    chat_data / bot_data бот не використовує, тож вони не зберігаються.
+
+    Application раз на update_interval передає лише змінені записи — усі виклики
+    update_* одного проходу накопичуються і пишуться однією транзакцією у фоновому
+    потоці. Після перезапуску користувач лишається в тому ж стані діалогу
+    з тим самим режимом, компанією та введеним ПІБ.
+    """
+
+    def __init__(self, path: str = PERSISTENCE_PATH, update_interval: float = PERSISTENCE_INTERVAL):
+        super().__init__(store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False), update_interval=update_interval)
+        self._db = LocalDb(path, SCHEMA)
+        self._lock = threading.Lock()
+        self._dirty = {}
+        self._writer = None
+        self.written = 0
+
+    # --- читання при старті ---
+    def _load(self, kind: str) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT id, value FROM data WHERE kind = ?", (kind,)).fetchall()
+        return {key: pickle.loads(value) for key, value in rows}
+
+    async def get_user_data(self) -> dict:
+        return await asyncio.to_thread(self._load, USER)
+
+    async def get_chat_data(self) -> dict:
+        return await asyncio.to_thread(self._load, CHAT)
+
+    async def get_bot_data(self) -> dict:
+        return (await asyncio.to_thread(self._load, BOT)).get(0, {})
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT key, state FROM conversations WHERE name = ?", (name,)).fetchall()
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in rows}
+
+    # --- запис ---
+    def _stage(self, table: str, key, value):
+        """value=None — видалити. Пише фонова задача, коли всі update_* проходу вже відпрацювали."""
+        self._dirty[(table, key)] = None if value is None else pickle.dumps(value)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_soon())
+
+    async def _write_soon(self):
+        # Application запускає update_* через gather — даємо їм усім додати свої записи
+        await asyncio.sleep(0)
+        while self._dirty:
+            batch, self._dirty = self._dirty, {}
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception:
+                logger.exception("Не вдалося зберегти %d записів персистентності", len(batch))
+                for key, value in batch.items():
+                    self._dirty.setdefault(key, value)
+                return
+
+    def _write(self, batch: dict):
+        upserts = {"data": [], "conversations": []}
+        deletes = {"data": [], "conversations": []}
+        for (table, key), value in batch.items():
+            if value is None:
+                deletes[table].append(key)
+            else:
+                upserts[table].append((*key, value))
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO data (kind, id, value) VALUES (?, ?, ?)", upserts["data"])
+                self._db.executemany("DELETE FROM data WHERE kind = ? AND id = ?", deletes["data"])
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)", upserts["conversations"]
+                )
+                self._db.executemany("DELETE FROM conversations WHERE name = ? AND key = ?", deletes["conversations"])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        self.written += len(batch)
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._stage("data", (USER, user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._stage("data", (CHAT, chat_id), data)
+
+    async def update_bot_data(self, data: dict) -> None:
+        self._stage("data", (BOT, 0), data)
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        self._stage("conversations", (name, json.dumps(list(key))), new_state)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._stage("data", (USER, user_id), None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._stage("data", (CHAT, chat_id), None)
+
+    # дані живуть у пам'яті Application — перечитувати з диска нічого
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Останній запис при зупинці бота."""
+        if self._writer is not None and not self._writer.done():
+            await self._writer
+        if self._dirty:
+            batch, self._dirty = self._dirty, {}
+            await asyncio.to_thread(self._write, batch)
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> dict:
+        return {"written": self.written, "pending": len(self._dirty)}
@@ -0,0 +1,251 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+
+import daily_stats
+from columnar import DateParser, SheetColumns, ordinal_iso
+from local_db import LocalDb
+from sheets import FIRST_DATA_ROW, SECURITY_SHEET, RETAIL_SHEET
+
+
+logger = logging.getLogger(__name__)
+
+# ====== НАЛАШТУВАННЯ ======
+REPLICA_PATH = os.getenv("Replica_Path", "replica.sqlite3")
+SYNC_INTERVAL = float(os.getenv("Replica_Sync_Interval", "60"))
+
+REPLICA_SHEETS = [SECURITY_SHEET, RETAIL_SHEET]
+
+# назва стовпця в таблиці → стовпець у репліці; решта стовпців (коментарі,
+# перевіряючий, дата народження) аналітиці не потрібні й не завантажуються
+COLUMNS = {
+    "Дата": "date",
+    "ПІБ": "pib",
+    "ІПН": "ipn",
+    "Статус": "status",
+    "Дата перевірки": "checked",
+    "Компанія": "company",
+}
+FIELDS = list(COLUMNS.values())
+POSITIONS = {field: i for i, field in enumerate(FIELDS)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    sheet TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    date TEXT, pib TEXT, ipn TEXT, status TEXT, checked TEXT, company TEXT,
+    date_iso TEXT, checked_iso TEXT,
+    PRIMARY KEY (sheet, row)
+);
+CREATE INDEX IF NOT EXISTS rows_date ON rows (sheet, date_iso);
+CREATE INDEX IF NOT EXISTS rows_checked ON rows (sheet, checked_iso);
+CREATE INDEX IF NOT EXISTS rows_ipn ON rows (sheet, ipn);
+CREATE INDEX IF NOT EXISTS rows_status ON rows (sheet, status);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# ====== РЕПЛІКА ======
+class Replica:
+    """Локальна SQLite-копія листів «Охорона» та «Кандидати».
+
+    Фонове завдання перевіряє час зміни таблиці (Drive modifiedTime) і лише
+    після змін перечитує потрібні стовпці обох листів одним values_batch_get. Усі читання
+    аналітики йдуть у репліку, тому працюють і під час збою Google Sheets.
+
+    У репліку записуються лише нові / змінені рядки, а тригери daily_stats
+    на кожну таку зміну оновлюють денні лічильники.
+    """
+
+    def __init__(self, pool, path: str = REPLICA_PATH, interval: float = SYNC_INTERVAL):
+        self.pool = pool
+        self.interval = interval
+        self._db = LocalDb(path, SCHEMA + daily_stats.SCHEMA, on_open=daily_stats.ensure)
+        self._lock = threading.Lock()
+        self._task = None
+        self.synced_at = 0.0
+        self._columns = {}
+
+    # --- метадані ---
+    def _meta(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def revision(self):
+        return self._meta("modified")
+
+    def is_ready(self) -> bool:
+        return self.revision is not None
+
+    # --- синхронізація ---
+    def sync(self, force: bool = False) -> bool:
+        """Перечитує листи, якщо таблиця змінилась. Блокуючий — через gateway."""
+        book = self.pool.spreadsheet()
+        modified = book.get_lastUpdateTime()
+        if not force and modified == self.revision:
+            self.synced_at = time.time()
+            return False
+
+        projections = [self.pool.projection(title, COLUMNS) for title in REPLICA_SHEETS]
+        ranges = [r for projection in projections for r in projection.ranges(qualified=True)]
+        response = book.values_batch_get(ranges, params={"majorDimension": "COLUMNS"})
+        value_ranges = [value_range.get("values", []) for value_range in response.get("valueRanges", [])]
+        columns = {}
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for projection in projections:
+                    n = len(projection.present)
+                    rows, value_ranges = projection.rows(value_ranges[:n]), value_ranges[n:]
+                    columns[projection.title] = self._load(projection.title, rows)
+                self._set_meta("modified", modified)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            # знімки стовпців оновлюються лише після успішного COMMIT
+            self._columns.update(columns)
+        self.synced_at = time.time()
+        logger.info("Репліку оновлено (modified=%s)", modified)
+        return True
+
+    def _load(self, title, rows):
+        """rows — кортежі стовпців FIELDS, починаючи з першого рядка даних."""
+        if not rows:
+            self._db.execute("DELETE FROM rows WHERE sheet = ? AND row > 0", (title,))
+            return None
+        previous = self._columns.get(title)
+        cols = SheetColumns.from_values(rows, POSITIONS, previous)
+        changed, removed = cols.changed_since(previous)
+
+        params = []
+        for i in changed:
+            number = cols.row[i]
+            params.append((
+                title, number, *rows[number - FIRST_DATA_ROW],
+                ordinal_iso(cols.date[i]), ordinal_iso(cols.checked[i]),
+            ))
+
+        # UPSERT лише змінених рядків — незмінені не чіпають тригери агрегатів
+        self._db.executemany(
+            "INSERT INTO rows (sheet, row, %s, date_iso, checked_iso) VALUES (?, ?, %s, ?, ?) "
+            "ON CONFLICT (sheet, row) DO UPDATE SET %s, date_iso = excluded.date_iso, "
+            "checked_iso = excluded.checked_iso WHERE %s"
+            % (
+                ", ".join(FIELDS), ", ".join("?" * len(FIELDS)),
+                ", ".join(f"{f} = excluded.{f}" for f in FIELDS),
+                " OR ".join(f"{f} IS NOT excluded.{f}" for f in FIELDS),
+            ),
+            params,
+        )
+        if previous is None:
+            # перший прохід після старту: прибрати рядки, яких уже немає в таблиці
+            present = set(cols.row)
+            removed = [
+                n for (n,) in self._db.execute("SELECT row FROM rows WHERE sheet = ? AND row > 0", (title,))
+                if n not in present
+            ]
+        self._db.executemany("DELETE FROM rows WHERE sheet = ? AND row = ?", [(title, n) for n in removed])
+        logger.info("Репліка '%s': %d рядків, змінено %d, видалено %d", title, len(cols), len(changed), len(removed))
+        return cols
+
+    # --- читання ---
+    def query(self, sql: str, args=()) -> list:
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def records(self, title: str) -> list:
+        """Рядки листа у форматі get_all_records (ключі — назви стовпців)."""
+        names = list(COLUMNS)
+        rows = self.query("SELECT %s FROM rows WHERE sheet = ? ORDER BY row" % ", ".join(FIELDS), (title,))
+        return [dict(zip(names, row)) for row in rows]
+
+    def by_date(self, title: str, day) -> list:
+        """(ПІБ, Статус) працівників, поданих у вказану дату."""
+        return self.query(
+            "SELECT pib, status FROM rows WHERE sheet = ? AND date_iso = ? ORDER BY row",
+            (title, day.isoformat()),
+        )
+
+    def iter_period(self, title: str, start, end, batch: int = 1000):
+        """Рядки FIELDS, подані за [start, end], у порядку дати подання.
+
+        Читається сторінками по `batch` (keyset по date_iso, rowid): пам'ять не росте
+        з розміром періоду, а репліка не блокується на весь прохід.
+        """
+        sql = (
+            "SELECT date_iso, rowid, %s FROM rows WHERE sheet = ? AND date_iso BETWEEN ? AND ? "
+            "AND (date_iso, rowid) > (?, ?) ORDER BY date_iso, rowid LIMIT ?" % ", ".join(FIELDS)
+        )
+        last = (start.isoformat(), 0)
+        while True:
+            # нижня межа BETWEEN — з останнього рядка сторінки: пошук по індексу йде з неї
+            page = self.query(sql, (title, last[0], end.isoformat(), *last, batch))
+            for row in page:
+                yield row[2:]
+            if len(page) < batch:
+                return
+            last = page[-1][:2]
+
+    # --- архів ---
+    # Перенесені в архівні листи рядки лишаються в репліці з від'ємним номером
+    # (-rowid): синхронізація гарячого листа їх не чіпає, статистика не змінюється.
+    def detach(self, title: str, numbers):
+        with self._lock:
+            self._db.executemany(
+                "UPDATE rows SET row = -rowid WHERE sheet = ? AND row = ?", [(title, n) for n in numbers]
+            )
+
+    def archived_count(self, title: str) -> int:
+        return self.query("SELECT COUNT(*) FROM rows WHERE sheet = ? AND row < 0", (title,))[0][0]
+
+    def add_archived(self, title: str, rows):
+        """rows — кортежі стовпців FIELDS з архівних листів (відновлення репліки)."""
+        parse = DateParser()
+        params = [
+            (title, *row, ordinal_iso(parse(row[POSITIONS["date"]])), ordinal_iso(parse(row[POSITIONS["checked"]])))
+            for row in rows
+        ]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO rows (sheet, row, %s, date_iso, checked_iso) "
+                "VALUES (?, -1 - (SELECT COALESCE(MAX(rowid), 0) FROM rows), %s, ?, ?)"
+                % (", ".join(FIELDS), ", ".join("?" * len(FIELDS))),
+                params,
+            )
+            self._db.execute("COMMIT")
+
+    # --- фонове завдання ---
+    async def run(self, gateway):
+        while True:
+            try:
+                await gateway.run(self.sync)
+            except Exception:
+                logger.exception("Не вдалося синхронізувати репліку")
+            await asyncio.sleep(self.interval)
+
+    def start(self, gateway):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(gateway))
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def ensure_ready(self, gateway):
+        """Перша синхронізація, якщо репліка ще порожня."""
+        if not self.is_ready():
+            await gateway.run(self.sync)
@@ -0,0 +1,122 @@
+import os
+import csv
+import logging
+import tempfile
+from datetime import date
+
+import daily_stats
+from replica import COLUMNS as REPLICA_COLUMNS
+
+
+logger = logging.getLogger(__name__)
+
+# ====== НАЛАШТУВАННЯ ======
+# скільки рядків читається з репліки за раз
+REPORT_BATCH = int(os.getenv("Report_Batch", "2000"))
+REPORT_DIR = os.getenv("Report_Dir") or None
+
+ROW_HEADER = list(REPLICA_COLUMNS)
+COMPANY_HEADER = ["Компанія", "Подано", "✅ Погоджено", "❌ Не погоджено", "⏳ Очікує", "Інше"]
+STATUS_HEADER = ["Статус", "Кількість"]
+NO_COMPANY = "—"
+
+# весь час: межі, що охоплюють будь-яку розпізнану дату
+ALL_TIME = (date.min, date.max)
+
+
+# ====== ПІДСУМКИ ======
+def company_rows(by_company: dict) -> list:
+    """Розбивка за компаніями (з денних агрегатів) + рядок «Разом»."""
+    rows, total = [], {}
+    for company, by_status in sorted(by_company.items(), key=lambda item: (item[0] == "", item[0])):
+        stats = daily_stats.summarize(by_status)
+        other = stats.checked - stats.approved - stats.rejected
+        rows.append([company or NO_COMPANY, stats.submitted, stats.approved, stats.rejected, stats.pending, other])
+        for status, n in by_status.items():
+            total[status] = total.get(status, 0) + n
+    if len(rows) > 1:
+        stats = daily_stats.summarize(total)
+        other = stats.checked - stats.approved - stats.rejected
+        rows.append(["Разом", stats.submitted, stats.approved, stats.rejected, stats.pending, other])
+    return rows
+
+
+def status_rows(by_company: dict) -> list:
+    total = {}
+    for by_status in by_company.values():
+        for status, n in by_status.items():
+            total[status] = total.get(status, 0) + n
+    return [[status or NO_COMPANY, n] for status, n in sorted(total.items(), key=lambda item: -item[1])]
+
+
+# ====== ЗАПИС ======
+def _write_csv(path: str, summary, statuses, rows) -> int:
+    written = 0
+    # utf-8-sig і «;» — щоб Excel відкрив файл без майстра імпорту
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(COMPANY_HEADER)
+        writer.writerows(summary)
+        writer.writerow([])
+        writer.writerow(STATUS_HEADER)
+        writer.writerows(statuses)
+        writer.writerow([])
+        writer.writerow(ROW_HEADER)
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+    return written
+
+
+def _write_xlsx(path: str, summary, statuses, rows) -> int:
+    from openpyxl import Workbook
+
+    # write_only: рядки одразу скидаються у тимчасовий файл, а не тримаються в пам'яті
+    book = Workbook(write_only=True)
+    totals = book.create_sheet("Підсумки")
+    totals.append(COMPANY_HEADER)
+    for row in summary:
+        totals.append(row)
+    totals.append([])
+    totals.append(STATUS_HEADER)
+    for row in statuses:
+        totals.append(row)
+
+    sheet = book.create_sheet("Рядки")
+    sheet.append(ROW_HEADER)
+    written = 0
+    for row in rows:
+        sheet.append(list(row))
+        written += 1
+    book.save(path)
+    return written
+
+
+WRITERS = {"csv": _write_csv, "xlsx": _write_xlsx}
+
+
+def build_report(replica, sheet: str, start: date, end: date, fmt: str = "csv"):
+    """Звіт за період у тимчасовий файл → (шлях, кількість рядків). Блокуючий.
+
+    Підсумки беруться з денних агрегатів, рядки — потоком із репліки,
+    тож пам'ять не залежить від довжини періоду. Файл видаляє викликач.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Невідомий формат звіту: {fmt}")
+    by_company = daily_stats.company_stats(replica, sheet, start, end)
+    fd, path = tempfile.mkstemp(prefix="report-", suffix=f".{fmt}", dir=REPORT_DIR)
+    os.close(fd)
+    try:
+        rows = replica.iter_period(sheet, start, end, batch=REPORT_BATCH)
+        written = WRITERS[fmt](path, company_rows(by_company), status_rows(by_company), rows)
+    except Exception:
+        os.remove(path)
+        raise
+    logger.info("Звіт '%s' %s..%s: %d рядків, %d КіБ", sheet, start, end, written, os.path.getsize(path) // 1024)
+    return path, written
+
+
+def report_filename(sheet: str, start: date, end: date, fmt: str) -> str:
+    if (start, end) == ALL_TIME:
+        return f"{sheet} весь час.{fmt}"
+    return f"{sheet} {start:%d.%m.%y}-{end:%d.%m.%y}.{fmt}"
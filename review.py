@@ -0,0 +1,269 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import defaultdict, namedtuple
+from contextlib import ExitStack
+from datetime import datetime
+
+from columnar import DateParser
+from ipn_index import normalize_ipn
+from local_db import LocalDb
+from notifications import INVALID_IPN, PENDING
+from sheets import FIRST_DATA_ROW, SECURITY_SHEET, RETAIL_SHEET, column_letter
+
+
+logger = logging.getLogger(__name__)
+
+# ====== НАЛАШТУВАННЯ ======
+REVIEW_PATH = os.getenv("Review_Path", "review.sqlite3")
+# як довго (сек) список «Очікує погодження» береться з кешу
+REVIEW_TTL = float(os.getenv("Review_Ttl", "60"))
+# як часто (сек) накопичені рішення записуються в таблицю
+REVIEW_FLUSH_INTERVAL = float(os.getenv("Review_Flush_Interval", "10"))
+REVIEW_BATCH = int(os.getenv("Review_Batch", "500"))
+
+REVIEW_SHEETS = [SECURITY_SHEET, RETAIL_SHEET]
+PENDING_COLUMNS = ("Дата", "ПІБ", "ІПН", "Статус", "Коментар", "Компанія")
+
+# рішення → клітинки рядка; «Дата перевірки» є лише в листі охорони
+APPROVE, REJECT, INVALID = "approve", "reject", "invalid"
+DECISIONS = {
+    APPROVE: {"Статус": "✅ Погоджено"},
+    REJECT: {"Статус": "❌ Не погоджено"},
+    # статус лишається «Очікує погодження» — подавач виправляє ІПН і надсилає знову
+    INVALID: {"Коментар": "Невірний ІПН"},
+}
+
+PendingRow = namedtuple("PendingRow", ["sheet", "row", "date", "pib", "ipn", "company"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    sheet TEXT NOT NULL,
+    ipn TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    decision TEXT NOT NULL,
+    reviewer TEXT NOT NULL,
+    checked TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (sheet, ipn)
+);
+"""
+
+
+def decision_cells(decision: str, reviewer: str, checked: str) -> dict:
+    """Назва стовпця → значення, яке пише рішення."""
+    cells = dict(DECISIONS[decision], **{"Перевіряючий": reviewer})
+    if decision != INVALID:
+        cells["Дата перевірки"] = checked
+    return cells
+
+
+def coalesce(title: str, cells: dict) -> list:
+    """{рядок: {позиція: значення}} → мінімум діапазонів для values_batch_update.
+
+    Суміжні стовпці рядка зливаються в один діапазон, а сусідні рядки з однаковим
+    набором стовпців — в один прямокутник (E5:G9).
+    """
+    spans = []
+    for row in sorted(cells):
+        positions = sorted(cells[row])
+        run = [positions[0]]
+        for pos in positions[1:]:
+            if pos == run[-1] + 1:
+                run.append(pos)
+            else:
+                spans.append((row, run))
+                run = [pos]
+        spans.append((row, run))
+
+    blocks = []
+    for row, run in spans:
+        values = [cells[row][pos] for pos in run]
+        last = blocks[-1] if blocks else None
+        if last and last["run"] == run and last["end"] == row - 1:
+            last["end"] = row
+            last["values"].append(values)
+        else:
+            blocks.append({"run": run, "start": row, "end": row, "values": [values]})
+
+    return [
+        {
+            "range": f"'{title}'!{column_letter(b['run'][0] + 1)}{b['start']}:{column_letter(b['run'][-1] + 1)}{b['end']}",
+            "values": b["values"],
+        }
+        for b in blocks
+    ]
+
+
+# ====== ЧЕРГА ПЕРЕВІРКИ ======
+class ReviewQueue:
+    """Список «Очікує погодження» для перевіряючих і накопичувач їхніх рішень.
+
+    Очікуючі рядки обох листів читаються одним values_batch_get (лише потрібні
+    стовпці) і кешуються на REVIEW_TTL. Рішення спершу фіксуються в локальному
+    SQLite (останнє рішення щодо ІПН перекриває попереднє), а фонове завдання
+    записує їх у таблицю одним values_batch_update з об'єднаними діапазонами.
+    """
+
+    def __init__(self, pool, path: str = REVIEW_PATH, ttl: float = REVIEW_TTL,
+                 interval: float = REVIEW_FLUSH_INTERVAL, batch: int = REVIEW_BATCH):
+        self.pool = pool
+        self.ttl = ttl
+        self.interval = interval
+        self.batch = batch
+        self._db = LocalDb(path, SCHEMA)
+        self._lock = threading.Lock()
+        # читання списку і запис рішень не перетинаються — номери рядків узгоджені
+        self._sheet_lock = threading.Lock()
+        self._rows = []
+        self._loaded_at = 0.0
+        self._task = None
+        self.written = 0
+        self.failures = 0
+
+    # --- очікуючі ---
+    def pending(self, force: bool = False) -> list:
+        """PendingRow без уже прийнятих рішень, старші — першими. Блокуючий — через gateway."""
+        with self._sheet_lock:
+            if force or time.monotonic() - self._loaded_at >= self.ttl:
+                self._load()
+            rows = self._rows
+        decided = self._decided()
+        return [r for r in rows if (r.sheet, r.ipn) not in decided]
+
+    def _load(self):
+        results = self.pool.read_across([(title, PENDING_COLUMNS, FIRST_DATA_ROW, None) for title in REVIEW_SHEETS])
+        parse = DateParser()
+        rows = []
+        for title, values in zip(REVIEW_SHEETS, results):
+            for number, (day, pib, ipn, status, comment, company) in enumerate(values, start=FIRST_DATA_ROW):
+                if status == PENDING and str(ipn).strip() and INVALID_IPN not in str(comment).lower():
+                    rows.append(PendingRow(title, number, day, pib, normalize_ipn(ipn), company))
+        rows.sort(key=lambda r: (parse(r.date), r.sheet, r.row))
+        self._rows = rows
+        self._loaded_at = time.monotonic()
+
+    def _decided(self) -> set:
+        with self._lock:
+            return set(self._db.execute("SELECT sheet, ipn FROM decisions"))
+
+    # --- рішення ---
+    def decide(self, item: PendingRow, decision: str, reviewer: str):
+        if decision not in DECISIONS:
+            raise ValueError(f"Невідоме рішення: {decision}")
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO decisions (sheet, ipn, row, decision, reviewer, checked, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (item.sheet, item.ipn, item.row, decision, reviewer,
+                 datetime.today().strftime("%d.%m.%y"), time.time()),
+            )
+
+    def undo(self, item: PendingRow) -> bool:
+        """Скасовує ще не записане рішення."""
+        with self._lock:
+            cur = self._db.execute("DELETE FROM decisions WHERE sheet = ? AND ipn = ?", (item.sheet, item.ipn))
+        return cur.rowcount > 0
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+
+    # --- запис у таблицю ---
+    def flush(self) -> int:
+        """Записує накопичені рішення одним values_batch_update. Блокуючий — через gateway."""
+        with self._lock:
+            batch = self._db.execute(
+                "SELECT sheet, ipn, row, decision, reviewer, checked, created FROM decisions ORDER BY created LIMIT ?",
+                (self.batch,),
+            ).fetchall()
+        if not batch:
+            return 0
+
+        titles = sorted({sheet for sheet, *_ in batch})
+        with self._sheet_lock, ExitStack() as stack:
+            # архів не видалить рядки між звіркою ІПН і записом (замки — завжди в одному порядку)
+            for title in titles:
+                stack.enter_context(self.pool.row_lock(title))
+            # рядки могли зсунутись (архів, ручні правки) — ІПН звіряються одним читанням
+            columns = dict(zip(titles, self.pool.read_across([(t, ("ІПН",), FIRST_DATA_ROW, None) for t in titles])))
+            moved = {}
+            cells = defaultdict(dict)
+            done, lost = [], []
+            for sheet, ipn, row, decision, reviewer, checked, created in batch:
+                number = self._locate(columns[sheet], ipn, row, moved.setdefault(sheet, {}))
+                if number is None:
+                    lost.append((sheet, ipn, created))
+                    continue
+                values = decision_cells(decision, reviewer, checked)
+                positions = self.pool.projection(sheet, tuple(values)).positions
+                for name, value in values.items():
+                    if name in positions:
+                        cells[sheet].setdefault(number, {})[positions[name]] = value
+                done.append((sheet, ipn, created, number))
+
+            data = [r for sheet in titles for r in coalesce(sheet, cells[sheet])]
+            try:
+                if data:
+                    self.pool.spreadsheet().values_batch_update(body={"valueInputOption": "RAW", "data": data})
+            except Exception:
+                # рішення лишаються в SQLite і підуть наступною пачкою
+                self.failures += 1
+                raise
+            written = {(sheet, ipn) for sheet, ipn, _, _ in done}
+            self._rows = [r for r in self._rows if (r.sheet, r.ipn) not in written]
+
+        # рішення, змінене під час запису, має новий created — воно лишається в черзі
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM decisions WHERE sheet = ? AND ipn = ? AND created = ?",
+                [(s, i, c) for s, i, c, _ in done] + lost,
+            )
+        if lost:
+            logger.warning("Перевірка: %d рішень не записано — рядків уже немає в таблиці", len(lost))
+        self.written += len(done)
+        logger.info("Перевірка: записано %d рішень (%d діапазонів)", len(done), len(data))
+        return len(done)
+
+    @staticmethod
+    def _locate(column, ipn: str, row: int, moved: dict):
+        """Поточний номер рядка з ІПН: той самий, якщо не зсунувся, інакше найближчий.
+
+        moved — ІПН → номери рядків, будується один раз на лист при першому зсуві.
+        """
+        i = row - FIRST_DATA_ROW
+        if 0 <= i < len(column) and str(column[i][0]).strip() and normalize_ipn(column[i][0]) == ipn:
+            return row
+        if not moved:
+            for number, (value,) in enumerate(column, start=FIRST_DATA_ROW):
+                if str(value).strip():
+                    moved.setdefault(normalize_ipn(value), []).append(number)
+        return min(moved.get(ipn, ()), key=lambda n: abs(n - row), default=None)
+
+    def stats(self) -> dict:
+        return {"depth": self.depth(), "written": self.written, "failures": self.failures, "cached": len(self._rows)}
+
+    # --- фонове завдання ---
+    async def run(self, gateway):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await gateway.run(self.flush, kind="write")
+            except Exception:
+                logger.exception("Не вдалося записати рішення перевірки")
+
+    def start(self, gateway):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(gateway))
+        return self._task
+
+    async def stop(self, gateway):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await gateway.run(self.flush, kind="write")
+        except Exception:
+            logger.exception("Рішення лишились у черзі, будуть записані після перезапуску")
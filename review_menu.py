@@ -0,0 +1,127 @@
+import os
+import logging
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+
+from bot import DIRECTION_LABELS, REVIEWING, SHEETS_UNAVAILABLE_TEXT, gateway, review_keyboard, reviews
+from review import APPROVE, INVALID, REJECT
+from sheets import SHEETS_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# скільки працівників на одній сторінці
+REVIEW_PAGE = int(os.getenv("Review_Page", "5"))
+CALLBACK_PATTERN = "^rv:"
+
+ACTIONS = {APPROVE: "✅", REJECT: "❌", INVALID: "⚠️ ІПН"}
+MARKS = {APPROVE: "✅ Погоджено", REJECT: "❌ Не погоджено", INVALID: "⚠️ Невірний ІПН"}
+
+
+# --- Сторінка черги ---
+def render(items, marks: dict, offset: int, total: int):
+    """Текст і inline-клавіатура сторінки; рішення позначаються, кнопки — «скасувати»."""
+    if not items:
+        return "🎉 Немає працівників, що очікують погодження.", InlineKeyboardMarkup(
+            [[InlineKeyboardButton("🔄 Оновити", callback_data="rv:p:0")]]
+        )
+
+    lines = [f"📝 Очікують погодження: {total} (з {offset + 1} по {offset + len(items)})", ""]
+    buttons = []
+    for i, item in enumerate(items):
+        n = offset + i + 1
+        company = f" · {item.company}" if item.company else ""
+        lines.append(f"{n}. {DIRECTION_LABELS.get(item.sheet, item.sheet)} · {item.date}{company}")
+        lines.append(f"    {item.pib} · {item.ipn}")
+        if i in marks:
+            lines.append(f"    → {MARKS[marks[i]]}")
+            buttons.append([InlineKeyboardButton(f"↩️ {n}: скасувати", callback_data=f"rv:u:{i}")])
+        else:
+            buttons.append([
+                InlineKeyboardButton(f"{label} {n}", callback_data=f"rv:d:{i}:{action}")
+                for action, label in ACTIONS.items()
+            ])
+
+    nav = []
+    if offset > 0:
+        nav.append(InlineKeyboardButton("⬅️", callback_data="rv:p:-"))
+    nav.append(InlineKeyboardButton("🔄", callback_data="rv:p:0"))
+    if offset + len(items) < total:
+        nav.append(InlineKeyboardButton("➡️", callback_data="rv:p:+"))
+    buttons.append(nav)
+    return "\n".join(lines), InlineKeyboardMarkup(buttons)
+
+
+async def _load_page(context, offset: int):
+    rows = await gateway.run(reviews.pending)
+    offset = max(0, min(offset, (len(rows) - 1) // REVIEW_PAGE * REVIEW_PAGE)) if rows else 0
+    context.user_data["review_offset"] = offset
+    context.user_data["review_items"] = rows[offset:offset + REVIEW_PAGE]
+    context.user_data["review_marks"] = {}
+    context.user_data["review_total"] = len(rows)
+
+
+def _page(context):
+    return render(
+        context.user_data["review_items"], context.user_data["review_marks"],
+        context.user_data["review_offset"], context.user_data["review_total"],
+    )
+
+
+# === Обробник "📝 На перевірці" ===
+async def show_review_queue(update, context):
+    try:
+        await _load_page(context, 0)
+    except SHEETS_ERRORS:
+        await update.message.reply_text(SHEETS_UNAVAILABLE_TEXT, reply_markup=review_keyboard)
+        return REVIEWING
+    text, markup = _page(context)
+    message = await update.message.reply_text(text, reply_markup=markup)
+    context.user_data["review_message"] = message.message_id
+    return REVIEWING
+
+
+# === Inline-кнопки сторінки ===
+async def review_callback(update, context):
+    query = update.callback_query
+    if context.user_data.get("mode") != "review":
+        await query.answer("⛔ Увійдіть як перевіряючий.", show_alert=True)
+        return
+    if query.message is None or query.message.message_id != context.user_data.get("review_message"):
+        await query.answer("Сторінка застаріла — відкрийте «📝 На перевірці» ще раз.", show_alert=True)
+        return
+
+    _, kind, *args = query.data.split(":")
+    items, marks = context.user_data["review_items"], context.user_data["review_marks"]
+
+    if kind == "p":
+        # вирішені зі сторінки зникають із черги — «далі» зсувається лише на невирішені
+        offset = context.user_data["review_offset"]
+        if args[0] == "+":
+            offset += len(items) - len(marks)
+        elif args[0] == "-":
+            offset -= REVIEW_PAGE
+        try:
+            await _load_page(context, offset)
+        except SHEETS_ERRORS:
+            await query.answer(SHEETS_UNAVAILABLE_TEXT, show_alert=True)
+            return
+    elif kind == "d":
+        i, action = int(args[0]), args[1]
+        reviews.decide(items[i], action, update.effective_user.full_name)
+        marks[i] = action
+    elif kind == "u":
+        i = int(args[0])
+        if not reviews.undo(items[i]):
+            await query.answer("Рішення вже записане в таблицю.", show_alert=True)
+            return
+        marks.pop(i, None)
+
+    await query.answer()
+    text, markup = _page(context)
+    try:
+        await query.edit_message_text(text, reply_markup=markup)
+    except BadRequest as e:
+        # «🔄» без змін у черзі — Telegram відповідає «message is not modified»
+        if "not modified" not in str(e):
+            raise
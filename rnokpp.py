@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+
+
+# ====== РНОКПП ======
+# ваги перших 9 цифр; контрольна — (сума mod 11) mod 10
+WEIGHTS = (-1, 5, 7, 9, 4, 6, 10, 5, 7)
+# перші 5 цифр — кількість днів від 31.12.1899
+EPOCH = date(1899, 12, 31)
+MIN_AGE = 14
+MAX_AGE = 90
+
+
+def control_digit(ipn: str) -> int:
+    return sum(w * int(d) for w, d in zip(WEIGHTS, ipn)) % 11 % 10
+
+
+def checksum_ok(ipn: str) -> bool:
+    """Контрольна (10-та) цифра РНОКПП збігається з обчисленою."""
+    return len(ipn) == 10 and ipn.isdigit() and control_digit(ipn) == int(ipn[9])
+
+
+def birth_date(ipn: str):
+    try:
+        return EPOCH + timedelta(days=int(ipn[:5]))
+    except (ValueError, OverflowError):
+        return None
+
+
+def birth_date_ok(ipn: str, today: date = None) -> bool:
+    """Дата народження з ІПН дає вік у межах MIN_AGE..MAX_AGE."""
+    born = birth_date(ipn)
+    if born is None:
+        return False
+    today = today or date.today()
+    age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+    return MIN_AGE <= age <= MAX_AGE
+
+
+def variants(ipn: str):
+    """Усі ІПН на відстані однієї описки: заміна цифри або перестановка сусідніх."""
+    result = set()
+    for i, digit in enumerate(ipn):
+        for other in "0123456789":
+            if other != digit:
+                result.add(ipn[:i] + other + ipn[i + 1:])
+        if i + 1 < len(ipn) and ipn[i + 1] != digit:
+            result.add(ipn[:i] + ipn[i + 1] + digit + ipn[i + 2:])
+    return result
@@ -0,0 +1,103 @@
+import os
+import time
+import logging
+from collections import deque
+
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import HTTPXRequest
+
+from metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+# ====== НАЛАШТУВАННЯ ======
+# якщо Webhook_Url задано — бот працює через webhook, інакше long polling.
+# Процес бота має бути один: у Procfile для polling масштабується worker, для
+# webhook — web (платформа передає PORT і HTTP-трафік лише процесу web).
+WEBHOOK_URL = os.getenv("Webhook_Url", "")
+WEBHOOK_LISTEN = os.getenv("Webhook_Listen", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", "8443"))
+WEBHOOK_PATH = os.getenv("Webhook_Path", "telegram")
+WEBHOOK_SECRET = os.getenv("Webhook_Secret") or None
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("Webhook_Max_Connections", "40"))
+
+
+class ChatOrderedApplication(Application):
+    """Application, що обробляє апдейти різних чатів паралельно,
+    а апдейти одного чату — строго по черзі.
+
+    Без цього при concurrent_updates ConversationHandler може побачити
+    старий стан, поки попереднє повідомлення того ж користувача ще обробляється.
+
+    PTB займає слот concurrent_updates ще до process_update, тому апдейт чату,
+    що вже обробляється, не чекає на місці, а стає в чергу цього чату й одразу
+    звільняє слот. Чергу дообробляє той самий виклик, що обробляє чат, — один
+    чат займає щонайбільше один слот і не блокує решту.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._chat_queues = {}
+
+    async def process_update(self, update: object) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            return await super().process_update(update)
+
+        queue = self._chat_queues.get(chat.id)
+        if queue is not None:
+            queue.append(update)
+            return
+
+        queue = self._chat_queues[chat.id] = deque()
+        try:
+            await super().process_update(update)
+            while queue:
+                await super().process_update(queue.popleft())
+        finally:
+            del self._chat_queues[chat.id]
+
+
+class MeteredRequest(HTTPXRequest):
+    """HTTP-клієнт Bot API, що міряє час кожного методу Telegram."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            registry.inc("telegram_api_errors_total", method=api_method)
+            raise
+        finally:
+            registry.observe("telegram_api_seconds", time.perf_counter() - started, method=api_method)
+        if code >= 400:
+            registry.inc("telegram_api_errors_total", method=api_method)
+        return code, payload
+
+
+def run(app: Application):
+    """Запускає бота: webhook, якщо задано Webhook_Url, інакше polling."""
+    if not WEBHOOK_URL:
+        if "PORT" in os.environ:
+            logger.warning("Задано PORT, але не Webhook_Url: бот працює через polling і порт не слухає — "
+                           "запускайте процес worker, а не web")
+        logger.info("Запуск у режимі polling")
+        app.run_polling()
+        return
+
+    if "PORT" not in os.environ:
+        logger.warning("Webhook без PORT від платформи: порт %d — запускайте процес web, а не worker", WEBHOOK_PORT)
+
+    url = f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}"
+    logger.info("Запуск у режимі webhook: %s (порт %d)", url, WEBHOOK_PORT)
+    app.run_webhook(
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=WEBHOOK_PATH,
+        webhook_url=url,
+        secret_token=WEBHOOK_SECRET,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+    )
@@ -0,0 +1,609 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import gspread
+import requests
+from oauth2client.service_account import ServiceAccountCredentials
+
+from metrics import SIZE_BUCKETS, registry
+
+
+logger = logging.getLogger(__name__)
+
+# ====== НАЛАШТУВАННЯ ======
+SPREADSHEET_TITLE = "Перевірка аутсорс"
+SPREADSHEET_KEY = os.getenv("Spreadsheet_Key")
+REFRESH_INTERVAL = int(os.getenv("Sheets_Refresh_Interval", "1800"))
+SHEETS_WORKERS = int(os.getenv("Sheets_Workers", "8"))
+SHEETS_TIMEOUT = float(os.getenv("Sheets_Timeout", "30"))
+SHEETS_RETRIES = int(os.getenv("Sheets_Retries", "4"))
+# квоти Sheets API на одного користувача (сервісний акаунт) за хвилину
+READS_PER_MINUTE = int(os.getenv("Sheets_Reads_Per_Minute", "60"))
+WRITES_PER_MINUTE = int(os.getenv("Sheets_Writes_Per_Minute", "60"))
+
+SECURITY_SHEET = "Охорона"
+RETAIL_SHEET = "Кандидати"
+
+HEADER_ROW = 1
+FIRST_DATA_ROW = 2
+
+SHEET_TITLES = {
+    "security": SECURITY_SHEET,
+    "retail": RETAIL_SHEET,
+}
+
+
+SCOPE = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive",
+]
+
+
+def sheet_title(mode: str) -> str:
+    """Назва листа для режиму (за замовчуванням — магазини)."""
+    return SHEET_TITLES.get(mode or "retail", RETAIL_SHEET)
+
+
+API_VERBS = {"append", "batchGet", "batchUpdate", "batchClear", "clear", "batchGetByDataFilter"}
+
+
+def api_method(method: str, endpoint: str) -> str:
+    """Коротка назва виклику API для міток метрик (без id таблиці та діапазонів)."""
+    if "/drive/" in endpoint:
+        return "drive"
+    verb = endpoint.rsplit(":", 1)[-1]
+    if verb in API_VERBS:
+        return verb
+    if "/values/" in endpoint:
+        return f"values_{method}"
+    return f"spreadsheet_{method}"
+
+
+def _count_rows(payload) -> int:
+    total = 0
+    for value_range in payload.get("valueRanges", [payload]):
+        values = value_range.get("values", [])
+        if value_range.get("majorDimension") == "COLUMNS":
+            total += max((len(column) for column in values), default=0)
+        else:
+            total += len(values)
+    return total
+
+
+class MeteredClient(gspread.Client):
+    """gspread.Client, що рахує кожен HTTP-запит до Google: час, байти, рядки, помилки.
+
+    Кожен запит до Sheets API списує токен квоти gateway, у потоці якого він виконується.
+    """
+
+    def request(self, method, endpoint, *args, **kwargs):
+        name = api_method(method, endpoint)
+        if name != "drive":
+            charge_request("read" if method == "get" else "write")
+        started = time.perf_counter()
+        try:
+            response = super().request(method, endpoint, *args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            registry.inc("sheets_api_errors_total", method=name, code=getattr(e.response, "status_code", ""))
+            raise
+        except Exception:
+            registry.inc("sheets_api_errors_total", method=name, code="network")
+            raise
+        finally:
+            registry.observe("sheets_api_seconds", time.perf_counter() - started, method=name)
+
+        registry.observe("sheets_response_bytes", len(response.content), SIZE_BUCKETS, method=name)
+        if "/values" in endpoint and method == "get":
+            # розбираємо JSON один раз: gspread отримає вже готовий результат
+            payload = response.json()
+            response.json = lambda **kwargs: payload
+            registry.observe("sheets_response_rows", _count_rows(payload), SIZE_BUCKETS, method=name)
+        return response
+
+
+def build_client():
+    """Авторизований клієнт gspread із Google_Creds_Json (викликається при першому зверненні)."""
+    creds_dict = json.loads(os.getenv("Google_Creds_Json"))
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, SCOPE)
+    # те саме, що gspread.authorize, але з обліком запитів
+    client = MeteredClient(auth=creds)
+    client.set_timeout(SHEETS_TIMEOUT)
+    return client
+
+
+# ====== ПРОЄКЦІЯ СТОВПЦІВ ======
+def column_letter(number: int) -> str:
+    """1 → A, 27 → AA."""
+    letters = ""
+    while number:
+        number, rest = divmod(number - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+class Projection:
+    """Потрібні стовпці листа, знайдені за назвами в рядку заголовка.
+
+    Кожен стовпець читається окремим діапазоном з majorDimension=COLUMNS —
+    без решти стовпців (довгих коментарів тощо) і без масиву на кожен рядок.
+    """
+
+    def __init__(self, title: str, header: list, names):
+        self.title = title
+        self.names = tuple(names)
+        header = [str(h).strip() for h in header]
+        self.positions = {name: header.index(name) for name in self.names if name in header}
+        # стовпці, яких немає в заголовку, не читаються і дають ""
+        self.present = [name for name in self.names if name in self.positions]
+
+    def ranges(self, start: int = FIRST_DATA_ROW, end: int = None, qualified: bool = False) -> list:
+        prefix = f"'{self.title}'!" if qualified else ""
+        result = []
+        for name in self.present:
+            letter = column_letter(self.positions[name] + 1)
+            result.append(f"{prefix}{letter}{start}:{letter}{end or ''}")
+        return result
+
+    def rows(self, columns) -> list:
+        """Відповіді на ranges() → кортежі в порядку names, по одному на рядок."""
+        values = {}
+        for name, column in zip(self.present, columns):
+            values[name] = column[0] if column else []
+        height = max((len(v) for v in values.values()), default=0)
+        empty = [""] * height
+        cols = [values.get(name, empty) for name in self.names]
+        return [
+            tuple(col[i] if i < len(col) else "" for col in cols)
+            for i in range(height)
+        ]
+
+
+# ====== ПУЛ ЛИСТІВ ======
+class SheetsPool:
+    """Тримає відкриту таблицю та об'єкти листів, щоб не робити client.open() на кожен запит.
+
+    Таблиця відкривається за ключем (Spreadsheet_Key) один раз; якщо ключ не задано —
+    один раз шукається за назвою, а далі використовується знайдений id.
+    Клієнт створюється ліниво (client_factory) — імпорт і старт бота не чекають на Google.
+    """
+
+    def __init__(self, client=None, key=None, title=SPREADSHEET_TITLE, client_factory=build_client):
+        self._client = client
+        self.client_factory = client_factory
+        self.key = key
+        self.title = title
+        self._book = None
+        self._worksheets = {}
+        self._headers = {}
+        self._lock = threading.Lock()
+        self._row_locks = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._client_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # --- доступ ---
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self.client_factory()
+        return self._client
+
+    def spreadsheet(self):
+        with self._lock:
+            if self._book is None:
+                self._book = self._open()
+            return self._book
+
+    def worksheet(self, title: str):
+        with self._lock:
+            ws = self._worksheets.get(title)
+            if ws is not None:
+                self.hits += 1
+                return ws
+            self.misses += 1
+        book = self.spreadsheet()
+        ws = book.worksheet(title)
+        with self._lock:
+            self._worksheets[title] = ws
+        return ws
+
+    def for_mode(self, mode: str):
+        return self.worksheet(sheet_title(mode))
+
+    def row_lock(self, title: str) -> threading.Lock:
+        """Спільний для всіх модулів замок листа: поки його тримають, рядки не видаляються.
+
+        Його бере і той, хто видаляє рядки (архів), і той, хто знаходить рядок за ІПН
+        та пише в нього за номером (рішення перевіряючих), — інакше запис влучить у чужий рядок.
+        """
+        with self._lock:
+            return self._row_locks.setdefault(title, threading.Lock())
+
+    # --- проєкції ---
+    def header(self, title: str) -> list:
+        """Рядок заголовка, прочитаний один раз (до наступного refresh)."""
+        with self._lock:
+            header = self._headers.get(title)
+        if header is None:
+            header = self.worksheet(title).row_values(HEADER_ROW)
+            with self._lock:
+                self._headers[title] = header
+        return header
+
+    def projection(self, title: str, names) -> Projection:
+        return Projection(title, self.header(title), names)
+
+    def read_columns(self, title: str, names, start: int = FIRST_DATA_ROW, end: int = None) -> list:
+        """Лише вказані стовпці листа — список кортежів."""
+        return self.read_many(title, [(names, start, end)])[0]
+
+    def read_many(self, title: str, requests) -> list:
+        """Кілька проєкцій (names, start, end) одного листа одним batch_get."""
+        ws = self.worksheet(title)
+        plans = [(self.projection(title, names), start, end) for names, start, end in requests]
+        ranges = [r for projection, start, end in plans for r in projection.ranges(start, end)]
+        columns = ws.batch_get(ranges, major_dimension="COLUMNS") if ranges else []
+        return self._split(plans, columns)
+
+    def read_across(self, requests) -> list:
+        """Проєкції (title, names, start, end) різних листів одним values_batch_get."""
+        plans = [(self.projection(title, names), start, end) for title, names, start, end in requests]
+        ranges = [r for projection, start, end in plans for r in projection.ranges(start, end, qualified=True)]
+        columns = []
+        if ranges:
+            response = self.spreadsheet().values_batch_get(ranges, params={"majorDimension": "COLUMNS"})
+            columns = [value_range.get("values", []) for value_range in response.get("valueRanges", [])]
+        return self._split(plans, columns)
+
+    @staticmethod
+    def _split(plans, columns) -> list:
+        result, i = [], 0
+        for projection, _, _ in plans:
+            n = len(projection.present)
+            result.append(projection.rows(columns[i:i + n]))
+            i += n
+        return result
+
+    def _open(self):
+        if self.key:
+            return self.client.open_by_key(self.key)
+        book = self.client.open(self.title)
+        # далі відкриваємо лише за ключем — без пошуку в Drive
+        self.key = book.id
+        logger.info("Таблицю '%s' знайдено за назвою, key=%s", self.title, self.key)
+        return book
+
+    # --- оновлення ---
+    def refresh(self):
+        """Оновлює OAuth-токен і перечитує метадані листів одним запитом."""
+        auth = getattr(self.client, "auth", None)
+        if auth is not None and not auth.valid:
+            self.client.login()
+
+        book = self.spreadsheet()
+        fresh = {ws.title: ws for ws in book.worksheets()}
+        with self._lock:
+            for title in list(self._worksheets):
+                if title in fresh:
+                    self._worksheets[title] = fresh[title]
+                else:
+                    self._worksheets.pop(title)
+            # заголовки перечитуються ліниво — на випадок перенесених стовпців
+            self._headers.clear()
+
+    def warm_up(self):
+        """Авторизація, відкриття таблиці й усі листи одним запитом worksheets()."""
+        started = time.monotonic()
+        book = self.spreadsheet()
+        fresh = {ws.title: ws for ws in book.worksheets()}
+        with self._lock:
+            for title, ws in fresh.items():
+                self._worksheets.setdefault(title, ws)
+        logger.info("Таблицю прогріто за %.0f мс (листів: %d)", (time.monotonic() - started) * 1000, len(fresh))
+
+    def start_warm_up(self):
+        """Прогрів у фоновому потоці: бот уже приймає апдейти, поки йде авторизація."""
+        def target():
+            try:
+                self.warm_up()
+            except Exception:
+                logger.exception("Не вдалося прогріти таблицю")
+
+        threading.Thread(target=target, name="sheets-warm-up", daemon=True).start()
+
+    def start_background_refresh(self, interval: int = REFRESH_INTERVAL):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._refresh_loop, args=(interval,), name="sheets-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def stop_background_refresh(self):
+        self._stop.set()
+
+    def _refresh_loop(self, interval: int):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Не вдалося оновити листи / токен")
+
+    # --- статистика ---
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cached": sorted(self._worksheets)}
+
+
+# ====== ASYNC-ШЛЮЗ ======
+class SheetsTimeout(Exception):
+    """Виклик Google Sheets не вклався в тайм-аут."""
+
+
+class SheetsAbandoned(SheetsTimeout):
+    """Виклик уже скасовано за тайм-аутом — наступний запит до Google не надсилається."""
+
+
+# помилки, після яких користувачу варто відповісти «таблиця недоступна»
+SHEETS_ERRORS = (SheetsTimeout, gspread.exceptions.APIError)
+
+
+class TokenBucket:
+    """Квота запитів на хвилину: до `per_minute` токенів, поповнення рівномірне.
+
+    Токен резервується одразу (баланс може піти в мінус), тож ті, хто чекає,
+    отримують квоту в порядку звернення. Перший запит виклику gateway оплачує
+    наперед асинхронно (acquire), не займаючи потік пулу; наступні запити того ж
+    виклику списуються з робочого потоку (reserve) і досипають різницю там.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.throttled = 0.0
+        self.waiting = 0
+        self._lock = threading.Lock()
+
+    def _level(self, now: float) -> float:
+        return min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+
+    def reserve(self, cost: float = 1) -> float:
+        """Списує токени → скільки секунд треба почекати до запиту (0 — можна одразу)."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = self._level(now) - cost
+            self.updated = now
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.throttled += delay
+        return delay
+
+    async def acquire(self, cost: float = 1) -> float:
+        """reserve, але очікування — в event loop."""
+        delay = self.reserve(cost)
+        if delay:
+            self.waiting += 1
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.refund(cost)
+                raise
+            finally:
+                self.waiting -= 1
+        return delay
+
+    def refund(self, cost: float = 1):
+        """Повертає невикористаний токен (виклик не зробив жодного запиту)."""
+        with self._lock:
+            self.tokens += cost
+
+
+class _Call:
+    """Виклик gateway, що зараз виконується в робочому потоці."""
+
+    def __init__(self, gateway, prepaid: str = None):
+        self.gateway = gateway
+        # квота, вже сплачена за перший запит ("read" / "write")
+        self.prepaid = prepaid
+        # скільки потік простояв у черзі квоти — до тайм-ауту не входить
+        self.waited = 0.0
+        # тайм-аут вийшов: подальші запити цього виклику не надсилаються
+        self.abandoned = False
+
+
+# виклик gateway, який зараз виконується в цьому потоці
+_current = threading.local()
+
+
+def charge_request(kind: str):
+    """Списує квоту на один запит до Google ("read" / "write").
+
+    Викликається клієнтом перед кожним HTTP-запитом; поза gateway (прогрів,
+    фонове оновлення дескрипторів) запити не тарифікуються.
+    """
+    call = getattr(_current, "call", None)
+    if call is None:
+        return
+    if call.abandoned:
+        raise SheetsAbandoned("виклик скасовано за тайм-аутом, запит не надіслано")
+    if call.prepaid == kind:
+        call.prepaid = None
+        return
+    delay = call.gateway._buckets[kind].reserve()
+    if delay:
+        call.waited += delay
+        time.sleep(delay)
+        if call.abandoned:
+            raise SheetsAbandoned("виклик скасовано за тайм-аутом, запит не надіслано")
+
+
+def is_retryable(error: Exception) -> bool:
+    """429 та 5xx від Google — тимчасові, їх варто повторити."""
+    if not isinstance(error, gspread.exceptions.APIError):
+        return False
+    code = getattr(error.response, "status_code", None)
+    return code == 429 or (code is not None and 500 <= code < 600)
+
+
+def is_unsent(error: Exception) -> bool:
+    """Запит точно не виконано: Google відхилив його (4xx) або з'єднання не встановилось.
+
+    Після решти помилок (тайм-аут читання відповіді, 5xx, обірване з'єднання)
+    запис міг уже відбутись — повторювати його наосліп не можна.
+    """
+    if isinstance(error, (SheetsAbandoned, requests.exceptions.ConnectTimeout)):
+        return True
+    if not isinstance(error, gspread.exceptions.APIError):
+        return False
+    code = getattr(error.response, "status_code", None)
+    return code is not None and 400 <= code < 500
+
+
+class SheetsGateway:
+    """Єдиний планувальник викликів Google Sheets.
+
+    Блокуючі виклики gspread виконуються в пулі потоків з тайм-аутом, не блокуючи
+    event loop. Читання й запис обмежені хвилинними квотами (token bucket), що
+    списуються за кожен HTTP-запит до Google, а не за виклик run — тож refresh
+    зі свіжим кешем квоти не витрачає, а flush_all з кількома запитами платить за всі;
+    однакові одночасні читання об'єднуються в один запит, результат якого
+    отримують усі, хто чекає. 429 / 5xx повторюються з експоненційною затримкою.
+
+    Виклик потрапляє в пул лише тоді, коли для нього є квота, а тайм-аут рахує
+    час роботи з Google без очікування квоти.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = SHEETS_WORKERS,
+        timeout: float = SHEETS_TIMEOUT,
+        reads_per_minute: int = READS_PER_MINUTE,
+        writes_per_minute: int = WRITES_PER_MINUTE,
+        retries: int = SHEETS_RETRIES,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheets")
+        self._buckets = {"read": TokenBucket(reads_per_minute), "write": TokenBucket(writes_per_minute)}
+        self._inflight = {}
+        self.running = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.errors = 0
+
+    async def run(self, fn, *args, kind: str = "read", key=None, timeout: float = None, **kwargs):
+        """kind — "read" / "write"; однакові читання (за key або fn + args) виконуються один раз."""
+        timeout = timeout or self.timeout
+        if kind == "read":
+            if key is None:
+                key = (fn, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return await self._call(fn, args, kwargs, kind, timeout)
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._call(fn, args, kwargs, kind, timeout))
+                self._inflight[key] = task
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            else:
+                self.coalesced += 1
+            # shield: скасування одного з тих, хто чекає, не скасовує спільний запит
+            return await asyncio.shield(task)
+        return await self._call(fn, args, kwargs, kind, timeout)
+
+    async def _call(self, fn, args, kwargs, kind, timeout):
+        name = getattr(fn, "__qualname__", repr(fn))
+        started = time.perf_counter()
+        try:
+            return await self._attempts(fn, args, kwargs, kind, timeout, name)
+        except Exception:
+            registry.inc("sheets_gateway_errors_total", fn=name, kind=kind)
+            raise
+        finally:
+            # разом з очікуванням квоти та повторами
+            registry.observe("sheets_gateway_seconds", time.perf_counter() - started, fn=name, kind=kind)
+
+    async def _attempts(self, fn, args, kwargs, kind, timeout, name):
+        for attempt in range(self.retries + 1):
+            # квота очікується тут, а не сном у потоці пулу
+            await self._buckets[kind].acquire()
+            call = _Call(self, prepaid=kind)
+            self.running += 1
+            try:
+                job = self._executor.submit(self._bound, call, fn, args, kwargs)
+                return await self._wait(job, call, timeout)
+            except asyncio.TimeoutError:
+                self.errors += 1
+                raise SheetsTimeout(f"{name}: немає відповіді за {timeout} с")
+            except Exception as e:
+                if attempt == self.retries or not is_retryable(e):
+                    self.errors += 1
+                    raise
+                self.retried += 1
+                delay = min(2 ** attempt, 64) * random.uniform(0.5, 1.5)
+                logger.warning("%s: %s, повтор через %.1f с", name, e, delay)
+            finally:
+                self.running -= 1
+            await asyncio.sleep(delay)
+
+    async def _wait(self, job, call, timeout):
+        """Як asyncio.wait_for, але час, який потік простояв у черзі квоти, до тайм-ауту не входить."""
+        loop = asyncio.get_running_loop()
+        future = asyncio.wrap_future(job)
+        deadline = loop.time() + timeout
+        try:
+            while not future.done():
+                remaining = deadline + call.waited - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait({future}, timeout=remaining)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # потік доробить поточний запит, але нових не надішле
+            call.abandoned = True
+            # результат покинутого виклику нікому не потрібен — без «exception was never retrieved»
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            if job.cancel():
+                # виклик так і не почався — сплачена квота повертається
+                self._refund(call)
+            raise
+        return future.result()
+
+    def _bound(self, call, fn, args, kwargs):
+        # запити gspread у цьому потоці списують квоту цього gateway
+        _current.call = call
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.call = None
+            self._refund(call)
+
+    def _refund(self, call):
+        kind, call.prepaid = call.prepaid, None
+        if kind is not None:
+            self._buckets[kind].refund()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": sum(b.waiting for b in self._buckets.values()),
+            "inflight_reads": len(self._inflight),
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+            "errors": self.errors,
+            "throttled_seconds": {kind: round(b.throttled, 1) for kind, b in self._buckets.items()},
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
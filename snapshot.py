@@ -0,0 +1,140 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+
+from local_db import LocalDb
+from sheets import FIRST_DATA_ROW
+
+
+logger = logging.getLogger(__name__)
+
+# ====== НАЛАШТУВАННЯ ======
+SNAPSHOT_PATH = os.getenv("Snapshot_Path", "snapshot.sqlite3")
+# як часто (сек) змінені індекси ІПН скидаються на диск
+SNAPSHOT_INTERVAL = float(os.getenv("Snapshot_Interval", "600"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS index_rows (
+    sheet TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    pib TEXT NOT NULL,
+    ipn TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (sheet, row)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS saved (
+    sheet TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL,
+    saved_at REAL NOT NULL
+);
+"""
+
+# пишуться лише рядки, що відрізняються від уже збережених
+UPSERT = """
+INSERT INTO index_rows (sheet, row, pib, ipn, status) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (sheet, row) DO UPDATE SET pib = excluded.pib, ipn = excluded.ipn, status = excluded.status
+WHERE pib != excluded.pib OR ipn != excluded.ipn OR status != excluded.status
+"""
+
+
+# ====== ЗНІМОК КЕШУ ======
+class CacheSnapshot:
+    """Індекси ІПН на диску для теплого старту.
+
+    Після перезапуску індекси відновлюються зі знімка ще до першого звернення
+    до таблиці, а перший refresh дочитує лише хвіст і статуси та звіряє останній
+    рядок — якщо лист змінився інакше, індекс перебудовується як зазвичай.
+    Заголовки листів не зберігаються: їх дешевше перечитати, ніж звіряти.
+    """
+
+    def __init__(self, index_for, titles, path: str = SNAPSHOT_PATH, interval: float = SNAPSHOT_INTERVAL):
+        self.index_for = index_for
+        self.titles = list(titles)
+        self.interval = interval
+        self._db = LocalDb(path, SCHEMA)
+        self._lock = threading.Lock()
+        # покоління індексу на момент останнього запису — незмінені не пишуться
+        self._saved = {}
+        self._task = None
+        self.restored = 0
+
+    # --- запис ---
+    def save(self) -> int:
+        """Скидає змінені індекси на диск → кількість рядків. Блокуючий."""
+        total = 0
+        for title in self.titles:
+            index = self.index_for(title)
+            generation = index.generation
+            if self._saved.get(title) == generation:
+                continue
+            rows = index.dump()
+            if rows is None:
+                continue
+            with self._lock:
+                self._db.execute("BEGIN")
+                try:
+                    self._db.executemany(
+                        UPSERT, ((title, number, *row) for number, row in enumerate(rows, start=FIRST_DATA_ROW))
+                    )
+                    self._db.execute(
+                        "DELETE FROM index_rows WHERE sheet = ? AND row >= ?", (title, FIRST_DATA_ROW + len(rows))
+                    )
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO saved (sheet, rows, saved_at) VALUES (?, ?, ?)",
+                        (title, len(rows), time.time()),
+                    )
+                    self._db.execute("COMMIT")
+                except Exception:
+                    self._db.execute("ROLLBACK")
+                    raise
+            self._saved[title] = generation
+            total += len(rows)
+        if total:
+            logger.info("Знімок індексів ІПН: збережено %d рядків", total)
+        return total
+
+    # --- відновлення ---
+    def restore(self) -> int:
+        """Заповнює порожні індекси зі знімка → кількість рядків. Блокуючий, таблицю не читає."""
+        total = 0
+        for title in self.titles:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT pib, ipn, status FROM index_rows WHERE sheet = ? ORDER BY row", (title,)
+                ).fetchall()
+            index = self.index_for(title)
+            if rows and index.restore(rows):
+                self._saved[title] = index.generation
+                total += len(rows)
+        self.restored = total
+        return total
+
+    def stats(self) -> dict:
+        return {"restored": self.restored, "saved_sheets": len(self._saved)}
+
+    # --- фонове завдання ---
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.save)
+            except Exception:
+                logger.exception("Не вдалося зберегти знімок індексів ІПН")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await asyncio.to_thread(self.save)
+        except Exception:
+            logger.exception("Не вдалося зберегти знімок індексів ІПН")
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+
+from ipn_index import normalize_ipn
+from local_db import LocalDb
+from sheets import is_unsent
+
+
+logger = logging.getLogger(__name__)
+
+# ====== НАЛАШТУВАННЯ ======
+JOURNAL_PATH = os.getenv("Journal_Path", "journal.sqlite3")
+FLUSH_INTERVAL = float(os.getenv("Journal_Flush_Interval", "5"))
+FLUSH_BATCH = int(os.getenv("Journal_Flush_Batch", "200"))
+MAX_BACKOFF = 300
+# не більше стільки id в одному IN (...) — ліміт змінних SQLite
+IN_CHUNK = 500
+
+# стани рядка в журналі
+PENDING, SENDING = "pending", "sending"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sheet TEXT NOT NULL,
+    ipn TEXT NOT NULL,
+    row_json TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_try REAL NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS journal_sheet_ipn ON journal (sheet, ipn);
+"""
+
+
+# ====== ЖУРНАЛ ======
+class WriteQueue:
+    """Write-behind черга: рядок спершу фіксується в локальному SQLite-журналі,
+    а фонове завдання дописує накопичені рядки в лист пачками через append_rows.
+
+    Після перезапуску незаписані рядки з журналу дописуються автоматично.
+    """
+
+    def __init__(self, pool, path: str = JOURNAL_PATH, interval: float = FLUSH_INTERVAL, batch: int = FLUSH_BATCH):
+        self.pool = pool
+        self.interval = interval
+        self.batch = batch
+        self._db = LocalDb(path, SCHEMA)
+        self._lock = threading.Lock()
+        self._task = None
+        # рядки, що були «в дорозі» при падінні й ще не звірені з таблицею
+        self._inflight = []
+        self._get_index = None
+        self.flushed = 0
+        self.failures = 0
+
+    # --- запис ---
+    def enqueue(self, sheet: str, ipn: str, row: list) -> int:
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT INTO journal (sheet, ipn, row_json, created) VALUES (?, ?, ?, ?)",
+                (sheet, normalize_ipn(ipn), json.dumps(row, ensure_ascii=False), time.time()),
+            )
+        return cur.lastrowid
+
+    def enqueue_many(self, sheet: str, items) -> list:
+        """Записує пачку [(ipn, row), ...] однією транзакцією → id записів журналу."""
+        now = time.time()
+        params = [(sheet, normalize_ipn(ipn), json.dumps(row, ensure_ascii=False), now) for ipn, row in items]
+        ids = []
+        with self._lock, self._transaction():
+            for args in params:
+                ids.append(self._db.execute(
+                    "INSERT INTO journal (sheet, ipn, row_json, created) VALUES (?, ?, ?, ?)", args
+                ).lastrowid)
+        return ids
+
+    def is_pending(self, sheet: str, ipn: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM journal WHERE sheet = ? AND ipn = ? LIMIT 1",
+                (sheet, normalize_ipn(ipn)),
+            ).fetchone()
+        return row is not None
+
+    def pending_ipns(self, sheet: str) -> set:
+        with self._lock:
+            rows = self._db.execute("SELECT ipn FROM journal WHERE sheet = ?", (sheet,)).fetchall()
+        return {ipn for (ipn,) in rows}
+
+    def pending(self, sheet: str = None) -> list:
+        """Незаписані рядки: [(sheet, ipn, row), ...] у порядку надходження."""
+        query = "SELECT sheet, ipn, row_json FROM journal"
+        args = ()
+        if sheet is not None:
+            query += " WHERE sheet = ?"
+            args = (sheet,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY id", args).fetchall()
+        return [(s, ipn, json.loads(data)) for s, ipn, data in rows]
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+
+    # --- скидання в таблицю ---
+    def flush(self, sheet: str, limit: int = None, ids=None) -> int:
+        """Дописує одну пачку рядків у лист. Блокуючий — викликати через gateway.
+
+        ids — лише ці записи журналу (наприклад, щойно прийнятий файл), інакше найстаріші.
+        """
+        ws = self.pool.worksheet(sheet)
+        query = "SELECT id, ipn, row_json FROM journal WHERE sheet = ? AND state = ? AND next_try <= ?"
+        args = [sheet, PENDING, time.time()]
+        with self._lock:
+            if ids is None:
+                batch = self._db.execute(query + " ORDER BY id LIMIT ?", [*args, limit or self.batch]).fetchall()
+            else:
+                batch = sorted(self._execute_in(query + " AND id IN (%s)", ids, args))[:limit or self.batch]
+            if not batch:
+                return 0
+            ids = [i for i, _, _ in batch]
+            self._mark(ids, SENDING)
+
+        try:
+            ws.append_rows([json.loads(data) for _, _, data in batch])
+        except Exception as e:
+            self.failures += 1
+            if not is_unsent(e):
+                # Google міг уже дописати рядки (тайм-аут відповіді, 5xx) — вони лишаються
+                # «в дорозі», і наступний flush_all звіряє їх з таблицею замість повтору
+                with self._lock:
+                    self._inflight += [(i, sheet, ipn) for i, ipn, _ in batch]
+                logger.exception("Запис %d рядків у '%s' не підтверджено, буде звірено з таблицею", len(ids), sheet)
+                raise
+            with self._lock:
+                attempts = max(
+                    a for (a,) in self._execute_in("SELECT MAX(attempts) FROM journal WHERE id IN (%s)", ids)
+                ) + 1
+                delay = min(2 ** attempts, MAX_BACKOFF) * random.uniform(0.5, 1.5)
+                self._execute_in(
+                    "UPDATE journal SET state = ?, attempts = ?, next_try = ? WHERE id IN (%s)",
+                    ids, (PENDING, attempts, time.time() + delay),
+                )
+            logger.exception("Не вдалося записати %d рядків у '%s', повтор через %.0f с", len(ids), sheet, delay)
+            raise
+
+        with self._lock:
+            self._execute_in("DELETE FROM journal WHERE id IN (%s)", ids)
+        self.flushed += len(ids)
+        return len(ids)
+
+    def flush_all(self) -> int:
+        if self._inflight:
+            self._reconcile()
+        total = 0
+        for sheet in self._sheets():
+            try:
+                while True:
+                    written = self.flush(sheet)
+                    total += written
+                    if written < self.batch:
+                        break
+            except Exception:
+                continue
+        return total
+
+    def _sheets(self) -> list:
+        with self._lock:
+            return [s for (s,) in self._db.execute("SELECT DISTINCT sheet FROM journal")]
+
+    def _mark(self, ids, state):
+        self._execute_in("UPDATE journal SET state = ? WHERE id IN (%s)", ids, (state,))
+
+    def _execute_in(self, sql: str, ids, args=()) -> list:
+        """sql з одним «IN (%s)» у кінці умов — частинами по IN_CHUNK id, однією транзакцією."""
+        ids = list(ids)
+        rows = []
+        with self._transaction():
+            for i in range(0, len(ids), IN_CHUNK):
+                chunk = ids[i:i + IN_CHUNK]
+                rows += self._db.execute(sql % ",".join("?" * len(chunk)), [*args, *chunk]).fetchall()
+        return rows
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN / COMMIT; при помилці — ROLLBACK, щоб з'єднання не лишилось у відкритій транзакції."""
+        self._db.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    # --- відновлення ---
+    def recover(self, get_index) -> int:
+        """Після падіння: рядки, що були «в дорозі», звіряються з таблицею,
+        щоб не дописати їх вдруге; решта лишається в черзі.
+
+        Якщо таблиця недоступна, такі рядки лишаються «в дорозі» (не дописуються)
+        і звіряються фоновим завданням, а запуск бота не зупиняється.
+        """
+        self._get_index = get_index
+        with self._lock:
+            self._inflight = self._db.execute(
+                "SELECT id, sheet, ipn FROM journal WHERE state = ?", (SENDING,)
+            ).fetchall()
+        self._reconcile()
+        return self.depth()
+
+    def _reconcile(self):
+        if self._get_index is None:
+            logger.warning("Журнал: %d рядків в дорозі, але recover ще не викликано", len(self._inflight))
+            return
+        with self._lock:
+            inflight = list(self._inflight)
+        settled, dropped = set(), []
+        for sheet in sorted({s for _, s, _ in inflight}):
+            rows = [(i, ipn) for i, s, ipn in inflight if s == sheet]
+            index = self._get_index(sheet)
+            try:
+                index.refresh(force=True)
+            except Exception as e:
+                logger.warning("Журнал: звірку %d рядків '%s' відкладено — %s", len(rows), sheet, e)
+                continue
+            settled.update(i for i, _ in rows)
+            # лише рядки, прочитані з таблиці: add_local (post_init) знає й про незаписані
+            dropped += [i for i, ipn in rows if index.in_sheet(ipn)]
+        if not settled:
+            return
+        with self._lock:
+            if dropped:
+                self._execute_in("DELETE FROM journal WHERE id IN (%s)", dropped)
+            self._mark(list(settled), PENDING)
+            self._inflight = [row for row in self._inflight if row[0] not in settled]
+        logger.info("Журнал: %d рядків були в дорозі, %d вже є в таблиці", len(settled), len(dropped))
+
+    # --- фонове завдання ---
+    async def run(self, gateway):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await gateway.run(self.flush_all, kind="write")
+            except Exception:
+                logger.exception("Помилка фонового запису журналу")
+
+    def start(self, gateway):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(gateway))
+        return self._task
+
+    async def stop(self, gateway):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await gateway.run(self.flush_all, kind="write")
+
+    def close(self):
+        with self._lock:
+            self._db.close()